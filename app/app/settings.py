@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
+from importlib.util import find_spec
 from pathlib import Path
 import os
 
@@ -56,6 +57,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -63,6 +65,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.RequestTimingMiddleware',
 ]
 
 ROOT_URLCONF = 'app.urls'
@@ -142,6 +145,10 @@ MEDIA_URL = '/static/media/'
 MEDIA_ROOT = '/vol/web/media'
 STATIC_ROOT = '/vol/web/static'
 
+# stream every upload to a temporary file while hashing it, so large
+# images never sit in memory and are stored under their SHA-256
+FILE_UPLOAD_HANDLERS = ['core.storage.HashingFileUploadHandler']
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -151,9 +158,87 @@ AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
-
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
+# MessagePack responses for internal services sending
+# `Accept: application/msgpack`, when the msgpack package is installed
+if find_spec('msgpack'):
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append(
+        'core.renderers.MessagePackRenderer'
+    )
+
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST':True ,
-}
\ No newline at end of file
+}
+
+# Cache
+# https://docs.djangoproject.com/en/3.2/topics/cache/
+# locmem is per process, so deployments running several workers must point
+# CACHE_BACKEND at a shared cache (see docker-compose-deploy.yml).
+
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache',
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
+    }
+}
+
+# seconds to keep cached recipe, tag and ingredient lists; 0 disables
+RECIPE_LIST_CACHE_TIMEOUT = int(os.environ.get('RECIPE_LIST_CACHE_TIMEOUT', 300))
+
+# token lookups are cached in the shared cache for TOKEN_AUTH_CACHE_TIMEOUT
+# seconds and per process for TOKEN_AUTH_LOCAL_TTL seconds, which bounds how
+# long other workers may keep accepting a revoked token
+TOKEN_AUTH_CACHE_TIMEOUT = int(os.environ.get('TOKEN_AUTH_CACHE_TIMEOUT', 300))
+TOKEN_AUTH_LOCAL_TTL = int(os.environ.get('TOKEN_AUTH_LOCAL_TTL', 5))
+TOKEN_AUTH_LOCAL_MAXSIZE = int(
+    os.environ.get('TOKEN_AUTH_LOCAL_MAXSIZE', 1024)
+)
+
+# access tokens expire after ACCESS_TOKEN_LIFETIME seconds (0 disables
+# expiry) and are renewed with a refresh token from POST /api/user/token/
+# refresh/, which skips the password hash that makes login expensive
+ACCESS_TOKEN_LIFETIME = int(os.environ.get('ACCESS_TOKEN_LIFETIME', 3600))
+REFRESH_TOKEN_LIFETIME = int(
+    os.environ.get('REFRESH_TOKEN_LIFETIME', 14 * 24 * 3600)
+)
+
+# threads per process resizing uploaded recipe images; 0 processes them
+# inline once the upload commits
+RECIPE_IMAGE_WORKERS = int(os.environ.get('RECIPE_IMAGE_WORKERS', 2))
+
+# share of requests (0 to 1) whose query count and database, serializer
+# and view times are sent in a Server-Timing header and logged as JSON;
+# off unless set, as in docker-compose-deploy.yml
+REQUEST_TIMING_SAMPLE_RATE = float(
+    os.environ.get('REQUEST_TIMING_SAMPLE_RATE', 0)
+)
+
+# served by core.middleware.MetricsMiddleware ahead of the session and auth
+# middleware, on an unpublished proxy port (see proxy/default.conf.tpl)
+METRICS_PATH = '/metrics'
+# bearer token the scraper must send; the endpoint is off while it is empty
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'core.middleware': {'handlers': ['console'], 'level': 'INFO'},
+    },
+}
@@ -0,0 +1,9 @@
+"""
+Benchmarks for the recipe api.
+
+Benchmarks are Django test cases so they run against a throwaway test
+database. They are named bench_*.py to keep them out of the normal test
+run; run them with:
+
+    python manage.py test benchmarks --pattern="bench_*.py"
+"""
@@ -0,0 +1,38 @@
+""" benchmark token authentication """
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from benchmarks.utils import measure, report
+from core.authentication import CachedTokenAuthentication
+
+
+class TokenAuthenticationBenchmark(TestCase):
+    """compare the plain and cached token authentication classes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user(
+            'bench@example.com', 'benchpass123'
+        )
+        cls.token = Token.objects.create(user=user)
+
+    def test_authenticate(self):
+        """benchmark authenticating one request"""
+        request = APIRequestFactory().get(
+            '/', HTTP_AUTHORIZATION=f'Token {self.token.key}'
+        )
+        rows = []
+        for label, auth in (
+            ('TokenAuthentication', TokenAuthentication()),
+            ('CachedTokenAuthentication', CachedTokenAuthentication()),
+        ):
+            # warm up so the cached class is measured on a cache hit
+            auth.authenticate(Request(request))
+            rows.append((label, measure(
+                lambda: auth.authenticate(Request(request)), repeat=1000
+            )))
+        report('token authentication', rows)
@@ -0,0 +1,49 @@
+""" benchmark tag and ingredient autocomplete """
+from itertools import cycle
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from benchmarks.utils import measure, report, seed_recipes
+
+RECIPES = 5000
+INGREDIENTS = 5000
+# latency budget for one typeahead request, end to end through the api
+P99_TARGET_MS = 50
+PREFIXES = ['i', 'ingredient 1', 'Ingredient 12', 'INGREDIENT 123', 'x']
+
+
+# measure the query, not the list cache
+@override_settings(RECIPE_LIST_CACHE_TIMEOUT=0)
+class AutocompleteBenchmark(TestCase):
+    """compare autocomplete latency with its p99 target"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            'bench@example.com', 'benchpass123'
+        )
+        seed_recipes(cls.user, RECIPES, tags=50, ingredients=INGREDIENTS,
+                     per_recipe=5)
+
+    def test_autocomplete(self):
+        """benchmark typeahead against filtering the full list"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = reverse('recipe:ingredient-autocomplete')
+        prefixes = cycle(PREFIXES)
+
+        rows = [
+            ('full list (client side filter)', measure(
+                lambda: client.get(reverse('recipe:ingredient-list')), 20
+            )),
+            ('autocomplete', measure(
+                lambda: client.get(url, {'q': next(prefixes)}), 200
+            )),
+        ]
+        report(f'ingredient typeahead, {INGREDIENTS} ingredients', rows)
+        # wall-clock numbers depend on the machine, so report the target
+        # rather than failing the run on a slow or busy host
+        print(f'  {"autocomplete p99 target":<32} {P99_TARGET_MS}ms')
@@ -0,0 +1,354 @@
+""" benchmark every recipe and user endpoint against seeded datasets
+
+Configured through the environment:
+
+    BENCH_SIZES   recipes per user to seed, comma separated (1000,10000)
+    BENCH_REPEAT  timed requests per endpoint (20)
+    BENCH_OUTPUT  JSON file the results are written to
+                  (bench_endpoints.json in the system temp directory)
+
+Writes the results so runs can be compared, e.g.
+
+    BENCH_SIZES=10000 BENCH_OUTPUT=/tmp/after.json python manage.py test \
+        benchmarks.bench_endpoints --pattern="bench_*.py"
+"""
+from decimal import Decimal
+from io import BytesIO
+import itertools
+import json
+import os
+import shutil
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, reset_queries
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, URLResolver, reverse
+from PIL import Image
+from rest_framework.test import APIClient
+
+from benchmarks.utils import percentile, seed_recipes
+from core.authentication import issue_tokens
+from core.models import Ingredient, Recipe, Tag
+import recipe.urls
+import user.urls
+
+SIZES = [
+    int(size) for size in os.environ.get('BENCH_SIZES', '1000,10000')
+    .split(',')
+]
+REPEAT = int(os.environ.get('BENCH_REPEAT', 20))
+OUTPUT = os.environ.get(
+    'BENCH_OUTPUT',
+    os.path.join(tempfile.gettempdir(), 'bench_endpoints.json'),
+)
+MEDIA_ROOT = tempfile.mkdtemp()
+PASSWORD = 'benchpass123'
+
+
+def route_names(urlpatterns):
+    """Return the names of every route in a urlconf, includes too"""
+    names = set()
+    for pattern in urlpatterns:
+        if isinstance(pattern, URLResolver):
+            names |= route_names(pattern.url_patterns)
+        elif isinstance(pattern, URLPattern) and pattern.name:
+            names.add(pattern.name)
+    return names
+
+
+def jpeg_bytes(size=(640, 480)):
+    buffer = BytesIO()
+    Image.new('RGB', size, (200, 80, 40)).save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+# measure the database work, not the response cache
+@override_settings(RECIPE_LIST_CACHE_TIMEOUT=0, MEDIA_ROOT=MEDIA_ROOT)
+class EndpointBenchmark(TestCase):
+    """latency, queries and memory of each endpoint per dataset size"""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.counter = itertools.count()
+        self.image = jpeg_bytes()
+
+    def test_endpoints(self):
+        """benchmark every route and save the results as JSON"""
+        results = []
+        for size in SIZES:
+            self.seed(size)
+            print(f'\n{size} recipes per user')
+            for route, label, prepare in self.scenarios():
+                result = self.run_scenario(prepare)
+                result.update(recipes=size, route=route, endpoint=label)
+                results.append(result)
+                print(
+                    f'  {label:<36} queries={result["queries"]:<4} '
+                    f'p50={result["p50_ms"]:8.2f}ms '
+                    f'p95={result["p95_ms"]:8.2f}ms '
+                    f'p99={result["p99_ms"]:8.2f}ms '
+                    f'peak={result["peak_kib"]:8.0f}KiB'
+                )
+
+        covered = {result['route'] for result in results}
+        self.assertEqual(
+            self.all_routes() - covered, set(), 'routes without a benchmark'
+        )
+        with open(OUTPUT, 'w') as f:
+            json.dump({
+                'database': connection.vendor,
+                'password_hashers': settings.PASSWORD_HASHERS[:1],
+                'repeat': REPEAT,
+                'sizes': SIZES,
+                'results': results,
+            }, f, indent=2)
+        print(f'\nresults written to {OUTPUT}')
+
+    def all_routes(self):
+        return {
+            f'{namespace}:{name}'
+            for namespace, urls in (
+                ('recipe', recipe.urls), ('user', user.urls),
+            )
+            for name in route_names(urls.urlpatterns)
+        }
+
+    def seed(self, size):
+        """Seed a user with `size` recipes and log the clients in"""
+        self.user = get_user_model().objects.create_user(
+            f'bench{size}@example.com', PASSWORD
+        )
+        seed_recipes(self.user, size, tags=50, ingredients=200)
+        self.recipe = Recipe.objects.filter(user=self.user).latest('id')
+        self.tag = Tag.objects.filter(user=self.user).first()
+        self.ingredient = Ingredient.objects.filter(user=self.user).first()
+        self.client = self.token_client(self.user)
+        # token refreshes replace the access token, so use another user
+        self.login_user = get_user_model().objects.create_user(
+            f'login{size}@example.com', PASSWORD
+        )
+
+    def token_client(self, user):
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Token {issue_tokens(user)["token"]}'
+        )
+        return client
+
+    def run_scenario(self, prepare):
+        """Time `prepare()`'s request, which is built outside the timing"""
+        reset_queries()
+        send = prepare()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.send(send)
+        queries = len(ctx.captured_queries)
+        self.assertLess(response.status_code, 400, response)
+
+        send = prepare()
+        tracemalloc.start()
+        self.send(send)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        timings = []
+        for i in range(REPEAT):
+            send = prepare()
+            start = time.perf_counter()
+            self.send(send)
+            timings.append((time.perf_counter() - start) * 1000)
+        return {
+            'queries': queries,
+            'mean_ms': statistics.mean(timings),
+            'p50_ms': percentile(timings, 50),
+            'p95_ms': percentile(timings, 95),
+            'p99_ms': percentile(timings, 99),
+            'peak_kib': peak / 1024,
+        }
+
+    def send(self, send):
+        """Send a request, reading streamed bodies to the end"""
+        response = send()
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def endpoint(self, route, label, method, url, data=None, client=None,
+                 format='json'):
+        """Build a (route, label, prepare) scenario.
+
+        `url` and `data` may be callables creating what the request
+        needs, e.g. the recipe a DELETE removes. They are called by
+        `prepare`, outside the timing, which returns the request to send.
+        """
+        def prepare():
+            args = (
+                url() if callable(url) else url,
+                data() if callable(data) else data,
+            )
+            kwargs = {} if method == 'GET' else {'format': format}
+            send = getattr(client or self.client, method.lower())
+            return lambda: send(*args, **kwargs)
+        return route, label, prepare
+
+    def new_recipe(self):
+        return Recipe.objects.create(
+            user=self.user, title=f'bench {next(self.counter)}',
+            time_minutes=10, price=Decimal('5.99'),
+        )
+
+    def new_recipe_url(self):
+        return reverse('recipe:recipe-detail', args=[self.new_recipe().id])
+
+    def recipe_payload(self):
+        n = next(self.counter)
+        return {
+            'title': f'bench {n}',
+            'time_minutes': 30,
+            'price': '12.50',
+            'tags': [{'name': f'tag {n % 50}'}, {'name': 'new tag'}],
+            'ingredients': [
+                {'name': f'ingredient {i % 200}'} for i in range(n, n + 5)
+            ],
+        }
+
+    def scenarios(self):
+        """Yield a scenario for each endpoint and method"""
+        endpoint = self.endpoint
+        recipes = reverse('recipe:recipe-list')
+        recipe = reverse('recipe:recipe-detail', args=[self.recipe.id])
+        bulk = reverse('recipe:recipe-bulk')
+        export = reverse('recipe:recipe-export')
+        tag_ids = ','.join(
+            str(pk) for pk in Tag.objects.filter(
+                user=self.user
+            ).values_list('id', flat=True)[:2]
+        )
+
+        yield endpoint(
+            'recipe:api-root', 'GET /api/recipe/', 'GET',
+            reverse('recipe:api-root'),
+        )
+        for label, params in (
+            ('GET recipes', None),
+            ('GET recipes (page)', {'page_size': 50}),
+            ('GET recipes (id,title)', {'fields': 'id,title'}),
+            ('GET recipes (tag filter)', {'tags': tag_ids}),
+            ('GET recipes (search)', {'search': 'recipe 99'}),
+        ):
+            yield endpoint('recipe:recipe-list', label, 'GET', recipes, params)
+        yield endpoint(
+            'recipe:recipe-list', 'POST recipes', 'POST', recipes,
+            self.recipe_payload,
+        )
+        yield endpoint('recipe:recipe-detail', 'GET recipe', 'GET', recipe)
+        yield endpoint(
+            'recipe:recipe-detail', 'PATCH recipe', 'PATCH', recipe,
+            {'title': 'patched'},
+        )
+        yield endpoint(
+            'recipe:recipe-detail', 'PUT recipe', 'PUT', recipe,
+            self.recipe_payload,
+        )
+        yield endpoint(
+            'recipe:recipe-detail', 'DELETE recipe', 'DELETE',
+            self.new_recipe_url,
+        )
+        yield endpoint(
+            'recipe:recipe-upload-image', 'POST recipe image', 'POST',
+            reverse('recipe:recipe-upload-image', args=[self.recipe.id]),
+            lambda: {'image': SimpleUploadedFile(
+                'bench.jpg', self.image, 'image/jpeg'
+            )},
+            format='multipart',
+        )
+        yield endpoint(
+            'recipe:recipe-bulk', 'POST recipes/bulk (50)', 'POST', bulk,
+            lambda: [self.recipe_payload() for i in range(50)],
+        )
+        yield endpoint(
+            'recipe:recipe-bulk', 'PATCH recipes/bulk (50)', 'PATCH', bulk,
+            lambda: [
+                {'id': self.new_recipe().id, 'time_minutes': 20}
+                for i in range(50)
+            ],
+        )
+        yield endpoint(
+            'recipe:recipe-bulk', 'DELETE recipes/bulk (50)', 'DELETE', bulk,
+            lambda: {'ids': [self.new_recipe().id for i in range(50)]},
+        )
+        yield endpoint('recipe:recipe-export', 'GET export', 'GET', export)
+        yield endpoint(
+            'recipe:recipe-export', 'GET export (csv)', 'GET', export,
+            {'export_format': 'csv'},
+        )
+
+        for basename, model, item in (
+            ('tag', Tag, self.tag),
+            ('ingredient', Ingredient, self.ingredient),
+        ):
+            items = reverse(f'recipe:{basename}-list')
+            yield endpoint(
+                f'recipe:{basename}-list', f'GET {basename}s', 'GET', items,
+            )
+            yield endpoint(
+                f'recipe:{basename}-list', f'GET {basename}s (counts)', 'GET',
+                items, {'assigned_only': 1, 'recipe_count': 1},
+            )
+            yield endpoint(
+                f'recipe:{basename}-autocomplete',
+                f'GET {basename}s/autocomplete', 'GET',
+                reverse(f'recipe:{basename}-autocomplete'),
+                {'q': f'{basename} 1'},
+            )
+            yield endpoint(
+                f'recipe:{basename}-detail', f'PATCH {basename}', 'PATCH',
+                reverse(f'recipe:{basename}-detail', args=[item.id]),
+                lambda: {'name': f'renamed {next(self.counter)}'},
+            )
+            yield endpoint(
+                f'recipe:{basename}-detail', f'DELETE {basename}', 'DELETE',
+                lambda basename=basename, model=model: reverse(
+                    f'recipe:{basename}-detail', args=[model.objects.create(
+                        user=self.user, name=f'gone {next(self.counter)}'
+                    ).id],
+                ),
+            )
+
+        anonymous = APIClient()
+        yield endpoint(
+            'user:create', 'POST user/create', 'POST',
+            reverse('user:create'),
+            lambda: {
+                'email': f'new{next(self.counter)}@example.com',
+                'password': PASSWORD,
+                'name': 'Bench',
+            },
+            client=anonymous,
+        )
+        yield endpoint(
+            'user:token', 'POST user/token', 'POST', reverse('user:token'),
+            {'email': self.login_user.email, 'password': PASSWORD},
+            client=anonymous,
+        )
+        yield endpoint(
+            'user:token-refresh', 'POST user/token/refresh', 'POST',
+            reverse('user:token-refresh'),
+            lambda: {'refresh': issue_tokens(self.login_user)['refresh']},
+            client=anonymous,
+        )
+        yield endpoint('user:me', 'GET user/me', 'GET', reverse('user:me'))
+        yield endpoint(
+            'user:me', 'PATCH user/me', 'PATCH', reverse('user:me'),
+            {'name': 'Bench'},
+        )
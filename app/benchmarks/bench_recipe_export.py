@@ -0,0 +1,40 @@
+""" benchmark streaming recipe exports """
+import time
+import tracemalloc
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from benchmarks.utils import seed_recipes
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+class RecipeExportBenchmark(TestCase):
+    """check export memory stays flat as the recipe count grows"""
+
+    def test_export_memory(self):
+        """benchmark peak memory and time of NDJSON and CSV exports"""
+        print('\nstreaming export')
+        for recipes in (1000, 5000):
+            user = get_user_model().objects.create_user(
+                f'bench{recipes}@example.com', 'benchpass123'
+            )
+            seed_recipes(user, recipes, tags=20, ingredients=40)
+            client = APIClient()
+            client.force_authenticate(user)
+            for export_format in ('ndjson', 'csv'):
+                tracemalloc.start()
+                start = time.perf_counter()
+                res = client.get(EXPORT_URL, {'export_format': export_format})
+                size = sum(len(chunk) for chunk in res.streaming_content)
+                elapsed = (time.perf_counter() - start) * 1000
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                print(
+                    f'  {recipes:>6} recipes {export_format:<7} '
+                    f'{size / 1024:8.0f}KiB {elapsed:8.0f}ms '
+                    f'peak={peak / 1024:8.0f}KiB'
+                )
@@ -0,0 +1,71 @@
+""" benchmark filtering recipes by tags and ingredients """
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from benchmarks.utils import measure, report, seed_recipes
+from core.models import Ingredient, Recipe, Tag
+from recipe.views import RecipeViewSet
+
+RECIPES = 5000
+
+
+class RecipeFilterBenchmark(TestCase):
+    """compare EXISTS filtering with the old join + DISTINCT plan"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            'bench@example.com', 'benchpass123'
+        )
+        seed_recipes(cls.user, RECIPES, tags=20, ingredients=40,
+                     per_recipe=8)
+        cls.tag_ids = list(
+            Tag.objects.filter(user=cls.user).values_list('id', flat=True)
+        )[:2]
+        cls.ingredient_ids = list(
+            Ingredient.objects.filter(
+                user=cls.user
+            ).values_list('id', flat=True)
+        )[:2]
+
+    def _legacy_queryset(self):
+        """the join + DISTINCT filter RecipeViewSet used to build"""
+        return Recipe.objects.filter(
+            tags__id__in=self.tag_ids,
+            ingredients__id__in=self.ingredient_ids,
+            user=self.user,
+        ).order_by('-id').distinct()
+
+    def _view_queryset(self, match):
+        """the queryset RecipeViewSet builds for the same filter"""
+        params = {
+            'tags': ','.join(map(str, self.tag_ids)),
+            'ingredients': ','.join(map(str, self.ingredient_ids)),
+            'match': match,
+        }
+        view = RecipeViewSet(action='list')
+        view.request = Request(APIRequestFactory().get('/', params))
+        view.request.user = self.user
+        return view.get_queryset().prefetch_related(None)
+
+    def test_filter_recipes(self):
+        """benchmark fetching the ids of matching recipes"""
+        rows = []
+        for label, queryset in (
+            ('join + distinct (any)', self._legacy_queryset()),
+            ('exists (any)', self._view_queryset('any')),
+            ('grouped count (all)', self._view_queryset('all')),
+        ):
+            result = measure(
+                lambda: list(queryset.values_list('id', flat=True)),
+                repeat=20,
+            )
+            result['rows'] = queryset.count()
+            rows.append((f'{label} rows={result["rows"]}', result))
+        report(f'filter {RECIPES} recipes by 2 tags and 2 ingredients', rows)
+        self.assertEqual(
+            set(self._legacy_queryset().values_list('id', flat=True)),
+            set(self._view_queryset('any').values_list('id', flat=True)),
+        )
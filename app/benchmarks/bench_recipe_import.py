@@ -0,0 +1,67 @@
+""" benchmark importing recipes """
+from io import StringIO
+import json
+import random
+import tempfile
+import time
+from types import SimpleNamespace
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from recipe.serializers import RecipeSerializer
+
+ROWS = 2000
+
+
+class RecipeImportBenchmark(TestCase):
+    """compare import_recipes with one serializer save per recipe"""
+
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(0)
+        cls.rows = [
+            {
+                'title': f'recipe {i}',
+                'time_minutes': rng.randint(5, 120),
+                'price': f'{rng.randint(100, 9999) / 100:.2f}',
+                'tags': [
+                    {'name': f'tag {n}'} for n in rng.sample(range(50), 3)
+                ],
+                'ingredients': [
+                    {'name': f'ingredient {n}'}
+                    for n in rng.sample(range(200), 5)
+                ],
+            }
+            for i in range(ROWS)
+        ]
+
+    def _user(self, email):
+        return get_user_model().objects.create_user(email, 'benchpass123')
+
+    def test_import(self):
+        """benchmark rows per second of both write paths"""
+        user = self._user('serializer@example.com')
+        # the serializer reads the owner from the request in its context
+        context = {'request': SimpleNamespace(user=user)}
+        start = time.perf_counter()
+        for row in self.rows:
+            serializer = RecipeSerializer(data=row, context=context)
+            serializer.is_valid(raise_exception=True)
+            serializer.save(user=user)
+        serializer_rate = ROWS / (time.perf_counter() - start)
+
+        user = self._user('command@example.com')
+        with tempfile.NamedTemporaryFile('w', suffix='.ndjson') as f:
+            f.writelines(json.dumps(row) + '\n' for row in self.rows)
+            f.flush()
+            start = time.perf_counter()
+            call_command(
+                'import_recipes', f.name, user=user.email, stdout=StringIO()
+            )
+            command_rate = ROWS / (time.perf_counter() - start)
+
+        print(f'\nimport {ROWS} recipes')
+        print(f'  {"RecipeSerializer.save":<32} {serializer_rate:8.0f} rows/s')
+        print(f'  {"import_recipes":<32} {command_rate:8.0f} rows/s')
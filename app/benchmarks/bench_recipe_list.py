@@ -0,0 +1,53 @@
+""" benchmark serializer and values based recipe lists """
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+
+from benchmarks.utils import measure, seed_recipes
+from core.models import Recipe
+from recipe.listing import recipe_rows
+from recipe.serializers import RecipeSerializer
+
+SIZES = (1000, 10000)
+
+
+class RecipeListBenchmark(TestCase):
+    """compare list throughput of RecipeSerializer and plain dicts"""
+
+    def test_list_rows_per_second(self):
+        """benchmark rendering every recipe of a user both ways"""
+        renderer = JSONRenderer()
+        fields = RecipeSerializer.Meta.fields
+        columns = [
+            name for name in fields if name not in ('tags', 'ingredients')
+        ]
+        print('\nrecipe list rows per second (query, build and render)')
+        for recipes in SIZES:
+            user = get_user_model().objects.create_user(
+                f'bench{recipes}@example.com', 'benchpass123'
+            )
+            seed_recipes(user, recipes, tags=20, ingredients=40)
+            queryset = Recipe.objects.filter(user=user).order_by('-id')
+
+            def serializer():
+                return renderer.render(RecipeSerializer(
+                    queryset.prefetch_related('tags', 'ingredients'),
+                    many=True,
+                ).data)
+
+            def values():
+                return renderer.render(recipe_rows(
+                    queryset.values(*columns), RecipeSerializer, fields
+                ))
+
+            self.assertEqual(serializer(), values())
+            for label, func in (
+                ('serializer', serializer), ('values', values),
+            ):
+                result = measure(func, repeat=5)
+                print(
+                    f'  {recipes:>6} recipes {label:<11} '
+                    f'queries={result["queries"]:<3} '
+                    f'mean={result["mean_ms"]:8.1f}ms '
+                    f'{recipes / result["mean_ms"] * 1000:10.0f} rows/s'
+                )
@@ -0,0 +1,90 @@
+""" benchmark tag/ingredient resolution when writing recipes """
+import itertools
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.test import APIRequestFactory
+
+from benchmarks.utils import measure, report
+from core.models import Ingredient, Recipe, Tag
+from recipe.serializers import RecipeSerializer
+
+
+class LegacyRecipeSerializer(RecipeSerializer):
+    """The per-item get_or_create implementation, kept as a baseline"""
+
+    def _add_tags(self, tags, recipe):
+        auth_user = self.context['request'].user
+        for tag in tags:
+            tag_obj, created = Tag.objects.get_or_create(
+                user=auth_user,
+                **tag
+            )
+            recipe.tags.add(tag_obj)
+
+    def _add_ingredients(self, ingredients, recipe):
+        auth_user = self.context['request'].user
+        for ingredient in ingredients:
+            ingredient_obj, created = Ingredient.objects.get_or_create(
+                user=auth_user,
+                **ingredient
+            )
+            recipe.ingredients.add(ingredient_obj)
+
+    def create(self, validated_data):
+        tags = validated_data.pop('tags', [])
+        ingredients = validated_data.pop('ingredients', [])
+        recipe = Recipe.objects.create(**validated_data)
+        self._add_tags(tags, recipe)
+        self._add_ingredients(ingredients, recipe)
+        return recipe
+
+
+class RecipeWriteBenchmark(TestCase):
+    """compare set-based and per-item tag/ingredient resolution"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'bench@example.com', 'benchpass123'
+        )
+        request = APIRequestFactory().post('/')
+        request.user = self.user
+        self.context = {'request': request}
+        self.counter = itertools.count()
+
+    def _create(self, serializer_class, size, shared):
+        """return a callable creating one recipe with `size` items"""
+        def run():
+            n = next(self.counter)
+            prefix = 'shared' if shared else f'new {n}'
+            data = {
+                'title': f'recipe {n}',
+                'time_minutes': 10,
+                'price': Decimal('5.99'),
+                'tags': [{'name': f'{prefix} tag {i}'} for i in range(size)],
+                'ingredients': [
+                    {'name': f'{prefix} ingredient {i}'} for i in range(size)
+                ],
+            }
+            serializer = serializer_class(data=data, context=self.context)
+            serializer.is_valid(raise_exception=True)
+            serializer.save(user=self.user)
+        return run
+
+    def test_create_recipe(self):
+        """benchmark creating recipes with new and existing items"""
+        rows = []
+        for size in (5, 25, 100):
+            for shared in (False, True):
+                kind = 'existing' if shared else 'new'
+                for label, serializer_class in (
+                    ('legacy', LegacyRecipeSerializer),
+                    ('set-based', RecipeSerializer),
+                ):
+                    result = measure(
+                        self._create(serializer_class, size, shared),
+                        repeat=10,
+                    )
+                    rows.append((f'{label} {size} {kind} items', result))
+        report('create recipe with tags and ingredients', rows)
@@ -0,0 +1,84 @@
+""" benchmark JSON and MessagePack rendering of recipe payloads """
+from decimal import Decimal
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from benchmarks.utils import measure, report, seed_recipes
+from core.models import Recipe
+from core.renderers import (
+    MessagePackRenderer,
+    ORJSONParser,
+    ORJSONRenderer,
+    msgpack,
+)
+from recipe.serializers import RecipeSerializer
+
+RECIPES = 1000
+BULK_ITEMS = 500
+
+
+class RendererBenchmark(TestCase):
+    """compare stdlib json, orjson and msgpack on recipe lists"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = get_user_model().objects.create_user(
+            'bench@example.com', 'benchpass123'
+        )
+        seed_recipes(user, RECIPES, tags=20, ingredients=40, per_recipe=5)
+        cls.data = RecipeSerializer(
+            Recipe.objects.filter(user=user).order_by('-id')
+            .prefetch_related('tags', 'ingredients'),
+            many=True,
+        ).data
+
+    def test_render(self):
+        """benchmark rendering a list of recipes"""
+        renderers = [
+            ('json (stdlib)', JSONRenderer()),
+            ('orjson', ORJSONRenderer()),
+        ]
+        if msgpack is not None:
+            renderers.append(('msgpack', MessagePackRenderer()))
+
+        rows = []
+        for label, renderer in renderers:
+            size = len(renderer.render(self.data))
+            rows.append((
+                f'{label} ({size // 1024}KiB)',
+                measure(lambda: renderer.render(self.data), 50),
+            ))
+        report(f'render {RECIPES} recipes', rows)
+
+        raw = [dict(row, price=Decimal(row['price'])) for row in self.data]
+        report(f'render {RECIPES} recipes with Decimal prices', [
+            ('json (stdlib)', measure(lambda: JSONRenderer().render(raw), 50)),
+            ('orjson', measure(lambda: ORJSONRenderer().render(raw), 50)),
+        ])
+
+    def test_parse(self):
+        """benchmark parsing a bulk create payload"""
+        body = JSONRenderer().render([
+            {
+                'title': row['title'],
+                'time_minutes': row['time_minutes'],
+                'price': float(row['price']),
+                'tags': [{'name': tag['name']} for tag in row['tags']],
+                'ingredients': [
+                    {'name': item['name']} for item in row['ingredients']
+                ],
+            }
+            for row in self.data[:BULK_ITEMS]
+        ])
+        report(f'parse a {BULK_ITEMS} recipe bulk payload', [
+            ('json (stdlib)', measure(
+                lambda: JSONParser().parse(BytesIO(body)), 50
+            )),
+            ('orjson', measure(
+                lambda: ORJSONParser().parse(BytesIO(body)), 50
+            )),
+        ])
@@ -0,0 +1,49 @@
+""" benchmark the overhead of the request timing middleware """
+from contextlib import nullcontext
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from benchmarks.utils import measure, report, seed_recipes
+
+RECIPES = 200
+
+
+@override_settings(RECIPE_LIST_CACHE_TIMEOUT=0)
+class RequestTimingBenchmark(TestCase):
+    """compare unsampled and sampled requests"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            'bench@example.com', 'benchpass123'
+        )
+        seed_recipes(cls.user, RECIPES)
+
+    def test_timing_overhead(self):
+        """benchmark a recipe list and detail with sampling off and on"""
+        client = APIClient()
+        client.force_authenticate(self.user)
+        list_url = reverse('recipe:recipe-list')
+        detail_url = reverse(
+            'recipe:recipe-detail', args=[self.user.recipe_set.first().id]
+        )
+
+        rows = []
+        for rate in (0, 1):
+            # capture the log lines rather than printing them
+            logs = (
+                self.assertLogs('core.middleware') if rate else nullcontext()
+            )
+            with override_settings(REQUEST_TIMING_SAMPLE_RATE=rate), logs:
+                rows += [
+                    (f'list, sample rate {rate}', measure(
+                        lambda: client.get(list_url), 100
+                    )),
+                    (f'detail, sample rate {rate}', measure(
+                        lambda: client.get(detail_url), 100
+                    )),
+                ]
+        report(f'request timing middleware, {RECIPES} recipes', rows)
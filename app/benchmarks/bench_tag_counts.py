@@ -0,0 +1,61 @@
+""" benchmark assigned_only and recipe counts on the tag list """
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from benchmarks.utils import measure, report, seed_recipes
+from core.models import Tag
+from recipe.views import TagViewSet
+
+RECIPES = 5000
+
+
+class TagCountBenchmark(TestCase):
+    """compare the tag list queries before and after EXISTS/GROUP BY"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user(
+            'bench@example.com', 'benchpass123'
+        )
+        seed_recipes(cls.user, RECIPES, tags=200, ingredients=20,
+                     per_recipe=5)
+
+    def _view_queryset(self, **params):
+        view = TagViewSet()
+        view.action = 'list'
+        view.request = Request(APIRequestFactory().get('/', params))
+        view.request.user = self.user
+        return view.get_queryset()
+
+    def _legacy_assigned(self):
+        """the join + DISTINCT filter the tag list used to build"""
+        return Tag.objects.filter(
+            user=self.user, recipe__isnull=False
+        ).order_by('-name').distinct()
+
+    def _per_tag_counts(self):
+        """counting each tag's recipes separately, as clients had to"""
+        return [
+            (tag, tag.recipe_set.count())
+            for tag in self._view_queryset(assigned_only=1)
+        ]
+
+    def test_tag_list(self):
+        """benchmark assigned_only with and without recipe counts"""
+        rows = [
+            ('join + distinct', measure(
+                lambda: list(self._legacy_assigned())
+            )),
+            ('exists', measure(
+                lambda: list(self._view_queryset(assigned_only=1))
+            )),
+            ('exists + count per tag', measure(self._per_tag_counts, 5)),
+            ('exists + group by count', measure(
+                lambda: list(self._view_queryset(
+                    assigned_only=1, recipe_count=1
+                ))
+            )),
+        ]
+        report(f'tag list, {RECIPES} recipes, 200 tags', rows)
@@ -0,0 +1,46 @@
+""" benchmark logging in against refreshing a token """
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from benchmarks.utils import measure, report
+
+TOKEN_URL = reverse('user:token')
+REFRESH_URL = reverse('user:token-refresh')
+
+
+# the production hasher, whatever the test settings use
+@override_settings(PASSWORD_HASHERS=[
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+])
+class TokenRefreshBenchmark(TestCase):
+    """compare the cost of a login with a refresh"""
+
+    def setUp(self):
+        get_user_model().objects.create_user(
+            'bench@example.com', 'benchpass123'
+        )
+        self.client = APIClient()
+
+    def test_login_vs_refresh(self):
+        """benchmark minting tokens by password and by refresh token"""
+        credentials = {
+            'email': 'bench@example.com', 'password': 'benchpass123',
+        }
+        state = self.client.post(TOKEN_URL, credentials).data
+
+        def refresh():
+            state.update(self.client.post(
+                REFRESH_URL, {'refresh': state['refresh']}
+            ).data)
+
+        rows = [
+            ('login', measure(
+                lambda: self.client.post(TOKEN_URL, credentials), repeat=20
+            )),
+            ('refresh', measure(refresh, repeat=20)),
+        ]
+        report('token endpoints', rows)
+        for label, result in rows:
+            print(f'  {label:<32} {1000 / result["mean_ms"]:8.1f} req/s')
@@ -0,0 +1,97 @@
+""" helpers shared by the benchmarks """
+import math
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+
+from core.models import Ingredient, Recipe, Tag
+
+
+def measure(func, repeat=20):
+    """Run `func` repeatedly and return its query count and latency"""
+    # test client requests reset the query log, so start from an empty
+    # log and count before the timed runs reset it again
+    reset_queries()
+    with CaptureQueriesContext(connection) as ctx:
+        func()
+    queries = len(ctx.captured_queries)
+    timings = []
+    for i in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        'queries': queries,
+        'mean_ms': statistics.mean(timings),
+        'p50_ms': statistics.median(timings),
+        'p99_ms': percentile(timings, 99),
+        'max_ms': max(timings),
+    }
+
+
+def percentile(values, pct):
+    """Return the nearest-rank percentile of `values`"""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(len(ordered) * pct / 100))
+    return ordered[rank - 1]
+
+
+def report(title, rows):
+    """Print benchmark rows as an aligned table"""
+    print(f'\n{title}')
+    for label, result in rows:
+        print(
+            f'  {label:<32} queries={result["queries"]:<5} '
+            f'mean={result["mean_ms"]:8.2f}ms '
+            f'p50={result["p50_ms"]:8.2f}ms '
+            f'p99={result["p99_ms"]:8.2f}ms '
+            f'max={result["max_ms"]:8.2f}ms'
+        )
+
+
+def seed_recipes(user, recipes, tags=50, ingredients=100, per_recipe=3,
+                 seed=0):
+    """Bulk insert recipes linked to random tags and ingredients"""
+    rng = random.Random(seed)
+    Tag.objects.bulk_create(
+        [Tag(user=user, name=f'tag {i}') for i in range(tags)]
+    )
+    Ingredient.objects.bulk_create([
+        Ingredient(user=user, name=f'ingredient {i}')
+        for i in range(ingredients)
+    ])
+    Recipe.objects.bulk_create([
+        Recipe(
+            user=user,
+            title=f'recipe {i}',
+            time_minutes=rng.randint(5, 120),
+            price=Decimal(rng.randint(100, 9999)) / 100,
+            link=f'https://example.com/recipe/{i}',
+            description=f'description of recipe {i}',
+        )
+        for i in range(recipes)
+    ], batch_size=1000)
+
+    # bulk_create only sets primary keys on some backends, so re-read them
+    recipe_ids = list(
+        Recipe.objects.filter(user=user).values_list('id', flat=True)
+    )
+    for field_name, model in (('tags', Tag), ('ingredients', Ingredient)):
+        related_ids = list(
+            model.objects.filter(user=user).values_list('id', flat=True)
+        )
+        field = Recipe._meta.get_field(field_name)
+        through = field.remote_field.through
+        column = f'{field.m2m_reverse_field_name()}_id'
+        through.objects.bulk_create([
+            through(recipe_id=recipe_id, **{column: related_id})
+            for recipe_id in recipe_ids
+            for related_id in rng.sample(
+                related_ids, min(per_recipe, len(related_ids))
+            )
+        ], batch_size=1000)
+    return recipe_ids
@@ -0,0 +1,229 @@
+"""
+cached token authentication
+"""
+from collections import OrderedDict
+from datetime import timedelta
+import hashlib
+import secrets
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import router, transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from core.metrics import record_cache
+from core.models import RefreshToken
+
+TOKEN_CACHE_KEY = 'auth:token:{key}'
+
+
+class LocalTTLCache:
+    """Small thread-safe in-process LRU cache with a per-entry TTL"""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+local_tokens = LocalTTLCache(
+    maxsize=settings.TOKEN_AUTH_LOCAL_MAXSIZE,
+    ttl=settings.TOKEN_AUTH_LOCAL_TTL,
+)
+
+
+def invalidate_token(key):
+    """Drop a token from the shared cache and this process's cache.
+
+    Other processes keep their copy for at most TOKEN_AUTH_LOCAL_TTL
+    seconds.
+    """
+    cache.delete(TOKEN_CACHE_KEY.format(key=key))
+    local_tokens.delete(key)
+
+
+def revoke_tokens(user):
+    """Delete the user's access and refresh tokens.
+
+    Deleting the access token sends post_delete, which drops it from the
+    auth caches (see core.signals).
+    """
+    Token.objects.filter(user=user).delete()
+    RefreshToken.objects.filter(user=user).delete()
+
+
+def access_token_expired(token, now=None):
+    """Return True once an access token is older than its lifetime"""
+    lifetime = settings.ACCESS_TOKEN_LIFETIME
+    if not lifetime:
+        return False
+    now = now or timezone.now()
+    return token.created + timedelta(seconds=lifetime) <= now
+
+
+def token_entry(token):
+    """Return what the caches keep of a token and its user.
+
+    Only plain field values are cached, never the instances, so requests
+    and threads don't share (and mutate) the same user. The password hash
+    is left out: it isn't needed to authenticate and stays out of Redis.
+    """
+    user = token.user
+    return {
+        'key': token.key,
+        'created': token.created,
+        'user': {
+            field.attname: getattr(user, field.attname)
+            for field in user._meta.concrete_fields
+            if field.attname != 'password'
+        },
+    }
+
+
+def token_from_entry(entry):
+    """Build a fresh token and user from a cached entry, without a query.
+
+    The password is deferred, so it is only loaded if it is used.
+    """
+    user_model = get_user_model()
+    user = user_model.from_db(
+        router.db_for_read(user_model),
+        list(entry['user']),
+        list(entry['user'].values()),
+    )
+    token = Token.from_db(
+        router.db_for_read(Token),
+        ['key', 'user_id', 'created'],
+        [entry['key'], user.pk, entry['created']],
+    )
+    token.user = user
+    return token
+
+
+def hash_refresh_token(raw_key):
+    return hashlib.sha256(raw_key.encode()).hexdigest()
+
+
+@transaction.atomic
+def issue_tokens(user):
+    """Create a refresh token and return the user's live access token.
+
+    Users have a single access token, shared by all their devices; it is
+    only replaced once it has expired, so one device logging in or
+    refreshing doesn't sign the others out. Returns the response body for
+    the client.
+    """
+    token = Token.objects.filter(user=user).first()
+    if token is not None and access_token_expired(token):
+        token.delete()
+        token = None
+    if token is None:
+        token = Token.objects.create(user=user)
+
+    raw_key = secrets.token_urlsafe(32)
+    RefreshToken.objects.create(
+        key=hash_refresh_token(raw_key),
+        user=user,
+        expires=timezone.now() + timedelta(
+            seconds=settings.REFRESH_TOKEN_LIFETIME
+        ),
+    )
+    data = {'token': token.key, 'refresh': raw_key}
+    if settings.ACCESS_TOKEN_LIFETIME:
+        data['expires_in'] = max(0, int((
+            token.created
+            + timedelta(seconds=settings.ACCESS_TOKEN_LIFETIME)
+            - timezone.now()
+        ).total_seconds()))
+    return data
+
+
+@transaction.atomic
+def refresh_tokens(raw_key):
+    """Exchange a refresh token for the access token and a new refresh token.
+
+    The access token is the user's live one, or a new one if it has
+    expired (see issue_tokens). The refresh token is single use. Returns
+    None if it is unknown, expired or belongs to an inactive user. No
+    password hashing happens here: the lookup is one indexed query on the
+    token's sha256.
+    """
+    refresh = RefreshToken.objects.select_for_update().select_related(
+        'user'
+    ).filter(key=hash_refresh_token(raw_key)).first()
+    if refresh is None:
+        return None
+    refresh.delete()
+    if refresh.expires <= timezone.now() or not refresh.user.is_active:
+        return None
+    return issue_tokens(refresh.user)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Drop-in TokenAuthentication that caches token lookups.
+
+    Tokens are looked up in a short-lived in-process cache, then in the
+    shared cache, and only then in the database, so most requests
+    authenticate without a query. Each request gets its own user
+    instance, built from the cached field values (see token_entry).
+    Cached entries are dropped when the token is deleted or its user is
+    saved (see core.signals). Tokens older than ACCESS_TOKEN_LIFETIME
+    are rejected.
+    """
+
+    def authenticate_credentials(self, key):
+        token = None
+        entry = local_tokens.get(key)
+        record_cache('token_local', entry is not None)
+        if entry is None:
+            entry = cache.get(TOKEN_CACHE_KEY.format(key=key))
+            record_cache('token_shared', entry is not None)
+            if entry is None:
+                user, token = super().authenticate_credentials(key)
+                entry = token_entry(token)
+                cache.set(
+                    TOKEN_CACHE_KEY.format(key=key),
+                    entry,
+                    settings.TOKEN_AUTH_CACHE_TIMEOUT,
+                )
+            local_tokens.set(key, entry)
+        if token is None:
+            token = token_from_entry(entry)
+        if access_token_expired(token):
+            raise AuthenticationFailed(_('Token has expired.'))
+        return (token.user, token)
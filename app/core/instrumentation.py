@@ -0,0 +1,71 @@
+"""
+per-request timings of database queries and serialization
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+import time
+
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Query count and time spent in the database and serializers"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self._serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        """Count and time a query; installed with execute_wrapper"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_seconds += time.perf_counter() - start
+            self.queries += 1
+
+
+def current_timings():
+    """Return the timings of the sampled request being handled, if any"""
+    return _current.get()
+
+
+@contextmanager
+def recording(timings):
+    """Make `timings` the current request's for the enclosed code"""
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def serializing():
+    """Add the enclosed code to the request's serializer time.
+
+    Nested serializers run inside their parent's timing, so only the
+    outermost one is counted. Outside a sampled request this costs one
+    context variable lookup.
+    """
+    timings = _current.get()
+    if timings is None or timings._serializing:
+        yield
+        return
+    timings._serializing = True
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.serializer_seconds += time.perf_counter() - start
+        timings._serializing = False
+
+
+class TimedSerializerMixin:
+    """Count a serializer's to_representation as serializer time"""
+
+    def to_representation(self, instance):
+        with serializing():
+            return super().to_representation(instance)
@@ -0,0 +1,212 @@
+"""
+django command to delete or quarantine media files no recipe references
+"""
+from functools import reduce
+import operator
+import os
+import shutil
+from string import hexdigits
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from core.models import Recipe, recipe_image_file_path
+from recipe.images import RENDITIONS_DIR
+
+
+def walk_files(root):
+    """Yield the paths of the files below `root`, one directory at a time.
+
+    Unlike os.walk this never holds a whole directory listing, so flat
+    directories of legacy uploads stream as well.
+    """
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry.path
+
+
+def batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def referenced_images(names):
+    """Return the names of the given image files some recipe uses"""
+    return set(
+        Recipe.objects.filter(image__in=names).values_list('image', flat=True)
+    )
+
+
+def source_prefix(stem):
+    """Return the start of the name of the image a rendition was made from.
+
+    Content addressed images live at `<dir>/ab/cd/abcd....<ext>`; older
+    uploads have other stems and sit directly in the upload directory.
+    """
+    directory = os.path.dirname(recipe_image_file_path(None, ''))
+    if len(stem) == 64 and all(c in hexdigits for c in stem):
+        directory = os.path.join(directory, stem[:2], stem[2:4])
+    return os.path.join(directory, stem).replace(os.sep, '/') + '.'
+
+
+def referenced_renditions(names):
+    """Return the names of the given rendition files still in use.
+
+    A rendition is named `<source stem>-<rendition>.<ext>`, so it is live
+    while some recipe's image has that stem. The source's name is known
+    up to its extension, so each stem is one prefix match, which uses the
+    index on Recipe.image.
+    """
+    stems = {
+        name: os.path.basename(name).rsplit('-', 1)[0] for name in names
+    }
+    images = Recipe.objects.filter(reduce(operator.or_, (
+        Q(image__startswith=source_prefix(stem))
+        for stem in set(stems.values())
+    ))).values_list('image', flat=True)
+    live = {
+        os.path.splitext(os.path.basename(image))[0] for image in images
+    }
+    return {name for name, stem in stems.items() if stem in live}
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete or quarantine recipe media files that no recipe references. '
+        'Files are compared against the database a batch at a time.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--prefix', default=os.path.join('uploads', 'recipe'),
+            help='directory below MEDIA_ROOT to collect',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='files checked against the database per query',
+        )
+        parser.add_argument(
+            '--min-age', type=int, default=3600,
+            help='skip files modified less than this many seconds ago, '
+                 'e.g. uploads whose recipe has not been saved yet',
+        )
+        parser.add_argument(
+            '--rate', type=float, default=0,
+            help='remove at most this many files per second (0: no limit)',
+        )
+        parser.add_argument(
+            '--quarantine', metavar='DIR',
+            help='move orphans below DIR instead of deleting them',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='only report what would be removed',
+        )
+
+    def handle(self, *args, **options):
+        """entry point for command"""
+        root = os.path.abspath(
+            os.path.join(settings.MEDIA_ROOT, options['prefix'])
+        )
+        quarantine = options['quarantine']
+        self.options = options
+        self.cutoff = time.time() - options['min_age']
+        self.last_removal = 0
+        scanned = orphans = freed = 0
+
+        if not os.path.isdir(root):
+            self.stdout.write(f'nothing to collect in {root}')
+            return
+
+        files = (
+            path for path in walk_files(root)
+            if not (quarantine and path.startswith(
+                os.path.join(os.path.abspath(quarantine), '')
+            ))
+        )
+        for batch in batches(files, options['batch_size']):
+            scanned += len(batch)
+            for path in self._orphans(batch):
+                size = self._remove(path)
+                if size is not None:
+                    orphans += 1
+                    freed += size
+
+        verb = 'would remove' if options['dry_run'] else 'removed'
+        self.stdout.write(self.style.SUCCESS(
+            f'scanned {scanned} files, {verb} {orphans} orphans '
+            f'({freed} bytes)'
+        ))
+
+    def _orphans(self, paths):
+        """Return the paths of a batch that no recipe references"""
+        names = {
+            os.path.relpath(path, settings.MEDIA_ROOT)
+            .replace(os.sep, '/'): path
+            for path in paths
+        }
+        renditions = {
+            name for name in names
+            if name.startswith(RENDITIONS_DIR.replace(os.sep, '/') + '/')
+        }
+        images = [name for name in names if name not in renditions]
+
+        live = set()
+        if images:
+            live |= referenced_images(images)
+        if renditions:
+            live |= referenced_renditions(renditions)
+        return [path for name, path in names.items() if name not in live]
+
+    def _remove(self, path):
+        """Delete or quarantine one orphan, returning its size.
+
+        Returns None for files modified within --min-age, which covers
+        files a new upload has just started to reference again.
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        if stat.st_mtime > self.cutoff:
+            return None
+
+        if self.options['verbosity'] > 1:
+            self.stdout.write(path)
+        if self.options['dry_run']:
+            return stat.st_size
+
+        self._throttle()
+        quarantine = self.options['quarantine']
+        if quarantine:
+            target = os.path.join(
+                quarantine, os.path.relpath(path, settings.MEDIA_ROOT)
+            )
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            shutil.move(path, target)
+        else:
+            os.remove(path)
+        return stat.st_size
+
+    def _throttle(self):
+        """Sleep as needed to stay under --rate removals per second"""
+        rate = self.options['rate']
+        if not rate:
+            return
+        wait = self.last_removal + 1 / rate - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        self.last_removal = time.monotonic()
@@ -0,0 +1,162 @@
+"""
+django command to bulk import recipes from NDJSON or CSV
+"""
+import csv
+import json
+import os
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from recipe.bulk import create_recipes
+from recipe.serializers import RecipeSerializer
+
+
+def read_ndjson(lines):
+    """Yield each non-blank line; it is parsed with the row's validation"""
+    for line in lines:
+        yield line.strip() or None
+
+
+def read_csv(lines):
+    """Yield CSV rows, splitting `; ` separated tag and ingredient names"""
+    for row in csv.DictReader(lines):
+        for column in ('tags', 'ingredients'):
+            if column in row:
+                row[column] = [
+                    name.strip() for name in (row[column] or '').split(';')
+                    if name.strip()
+                ]
+        yield row
+
+
+READERS = {'ndjson': read_ndjson, 'csv': read_csv}
+
+
+def normalize(row):
+    """Accept tags and ingredients as plain names or as {"name": ...}"""
+    if isinstance(row, str):
+        row = json.loads(row)
+    if not isinstance(row, dict):
+        raise ValueError('expected a JSON object')
+    for column in ('tags', 'ingredients'):
+        if isinstance(row.get(column), list):
+            row[column] = [
+                {'name': item} if isinstance(item, str) else item
+                for item in row[column]
+            ]
+    return row
+
+
+class Command(BaseCommand):
+    help = (
+        'Import recipes for a user from NDJSON or CSV (the export formats). '
+        'Rows are validated and inserted a batch at a time.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='file to import, or - for stdin')
+        parser.add_argument(
+            '--user', required=True, help='email of the owning user',
+        )
+        parser.add_argument(
+            '--format', choices=list(READERS), dest='input_format',
+            help='input format; guessed from the file extension if omitted',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='rows validated and inserted per transaction',
+        )
+        parser.add_argument(
+            '--checkpoint', metavar='FILE',
+            help='record progress in FILE and resume from it if it exists',
+        )
+
+    def handle(self, *args, **options):
+        """entry point for command"""
+        try:
+            user = get_user_model().objects.get(email=options['user'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f'no user with email {options["user"]}')
+
+        path = options['path']
+        input_format = options['input_format'] or (
+            'csv' if path.lower().endswith('.csv') else 'ndjson'
+        )
+        checkpoint = options['checkpoint']
+        skip = self._read_checkpoint(checkpoint)
+        if skip:
+            self.stdout.write(f'resuming after row {skip}')
+
+        source = sys.stdin if path == '-' else open(path, newline='')
+        try:
+            self._import(
+                user, READERS[input_format](source), options['batch_size'],
+                checkpoint, skip,
+            )
+        finally:
+            if source is not sys.stdin:
+                source.close()
+
+    def _import(self, user, rows, batch_size, checkpoint, skip):
+        serializer = RecipeSerializer()
+        imported = failed = number = 0
+        batch = []
+        start = time.perf_counter()
+
+        for number, row in enumerate(rows, start=1):
+            if number <= skip or row is None:
+                continue
+            try:
+                batch.append(serializer.run_validation(normalize(row)))
+            except ValidationError as error:
+                failed += 1
+                self.stderr.write(f'row {number}: {error.detail}')
+            except ValueError as error:
+                failed += 1
+                self.stderr.write(f'row {number}: {error}')
+            if len(batch) >= batch_size:
+                imported += self._load(user, batch)
+                self._progress(checkpoint, number, imported, start)
+                batch = []
+
+        if batch:
+            imported += self._load(user, batch)
+        self._progress(checkpoint, max(number, skip), imported, start)
+        self.stdout.write(self.style.SUCCESS(
+            f'imported {imported} recipes, skipped {failed} invalid rows'
+        ))
+
+    def _load(self, user, batch):
+        """Insert one validated batch, tags and ingredients included"""
+        with transaction.atomic():
+            create_recipes(user, batch)
+        return len(batch)
+
+    def _progress(self, checkpoint, done, imported, start):
+        """Save the checkpoint and report the import rate so far.
+
+        The checkpoint is written after the batch commits, so a crash in
+        between re-imports at most that one batch when resuming.
+        """
+        if checkpoint:
+            tmp = f'{checkpoint}.tmp'
+            with open(tmp, 'w') as f:
+                json.dump({'rows': done}, f)
+            os.replace(tmp, checkpoint)
+        elapsed = time.perf_counter() - start
+        rate = imported / elapsed if elapsed else 0
+        self.stdout.write(
+            f'{done} rows read, {imported} recipes imported, '
+            f'{rate:.0f} rows/s'
+        )
+
+    def _read_checkpoint(self, checkpoint):
+        if not checkpoint or not os.path.exists(checkpoint):
+            return 0
+        with open(checkpoint) as f:
+            return json.load(f)['rows']
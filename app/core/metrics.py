@@ -0,0 +1,83 @@
+"""
+prometheus metrics of the api, shared by the uwsgi worker processes
+
+With PROMETHEUS_MULTIPROC_DIR set, prometheus_client keeps every value
+in a memory mapped file per process and the metrics view adds them up
+across workers. scripts/run.sh sets and empties the directory before
+uwsgi starts. Without it (tests, runserver) values live in the process.
+"""
+import hmac
+import os
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotFound
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+REQUESTS = Counter(
+    'http_requests_total',
+    'Requests handled, by route, method and status code',
+    ['route', 'method', 'status'],
+)
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds',
+    'Time to handle a request, by route and method',
+    ['route', 'method'],
+)
+DB_QUERIES = Histogram(
+    'http_request_db_queries',
+    'Database queries run by a request, by route',
+    ['route'],
+    buckets=(0, 1, 2, 3, 5, 10, 20, 50, 100, 200, float('inf')),
+)
+DB_LATENCY = Histogram(
+    'http_request_db_duration_seconds',
+    'Time a request spent in the database, by route',
+    ['route'],
+)
+CACHE_REQUESTS = Counter(
+    'cache_requests_total',
+    'Cache lookups by cache and result (hit or miss); the hit ratio is '
+    'rate(hit) / rate(hit + miss)',
+    ['cache', 'result'],
+)
+
+
+def record_cache(name, hit):
+    CACHE_REQUESTS.labels(name, 'hit' if hit else 'miss').inc()
+
+
+def metrics_registry():
+    """Return the registry to expose, aggregating workers if needed"""
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def metrics_view(request):
+    """Serve the metrics in the Prometheus text format.
+
+    The scraper authenticates with `Authorization: Bearer METRICS_TOKEN`;
+    without a token configured the endpoint doesn't exist.
+    """
+    if not settings.METRICS_TOKEN:
+        return HttpResponseNotFound()
+    expected = f'Bearer {settings.METRICS_TOKEN}'
+    if not hmac.compare_digest(
+        request.META.get('HTTP_AUTHORIZATION', '').encode(), expected.encode()
+    ):
+        response = HttpResponse('Invalid metrics token.', status=401)
+        response['WWW-Authenticate'] = 'Bearer'
+        return response
+    return HttpResponse(
+        generate_latest(metrics_registry()), content_type=CONTENT_TYPE_LATEST
+    )
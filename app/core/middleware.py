@@ -0,0 +1,147 @@
+"""
+middleware timing requests and serving the prometheus metrics
+"""
+from contextlib import ExitStack, contextmanager
+from functools import partial
+import json
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from core import metrics
+from core.instrumentation import RequestTimings, recording
+
+logger = logging.getLogger(__name__)
+
+METHODS = {'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'}
+
+
+@contextmanager
+def counting_queries(timings):
+    """Count and time the queries of every connection into `timings`"""
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(timings))
+        yield
+
+
+@contextmanager
+def measuring(timings):
+    """Record queries and serializer time of the enclosed code"""
+    with recording(timings), counting_queries(timings):
+        yield
+
+
+def follow_stream(response, context, finish):
+    """Call `finish` once a response's content has been sent.
+
+    A streamed response (e.g. the recipe export) runs its queries while
+    the server iterates over the content, after the view has returned,
+    so the iteration is wrapped in `context` and finish() runs when the
+    content is exhausted or closed. Other responses finish at once.
+    """
+    if not response.streaming:
+        finish()
+        return
+    content = response.streaming_content
+
+    def stream():
+        try:
+            with context():
+                yield from content
+        finally:
+            finish()
+
+    response.streaming_content = stream()
+
+
+def server_timing(timings, view_seconds):
+    """Format timings as a Server-Timing header value"""
+    return ', '.join([
+        f'db;dur={timings.db_seconds * 1000:.2f};'
+        f'desc="{timings.queries} queries"',
+        f'serializer;dur={timings.serializer_seconds * 1000:.2f}',
+        f'view;dur={view_seconds * 1000:.2f}',
+    ])
+
+
+class RequestTimingMiddleware:
+    """Time the database, serializers and view of sampled requests.
+
+    REQUEST_TIMING_SAMPLE_RATE of the requests are sampled. They get a
+    Server-Timing header and log one JSON line to `core.middleware`.
+    Queries are counted with execute_wrapper on every connection, so
+    requests that aren't sampled take no extra work beyond one random().
+    The header only covers the view; for streamed responses the log line
+    is written once the content is sent and counts its queries too.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = settings.REQUEST_TIMING_SAMPLE_RATE
+        if not rate or (rate < 1 and random.random() >= rate):
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        start = time.perf_counter()
+        with measuring(timings):
+            response = self.get_response(request)
+        view_seconds = time.perf_counter() - start
+        response['Server-Timing'] = server_timing(timings, view_seconds)
+
+        def log():
+            logger.info(json.dumps({
+                'event': 'request_timing',
+                'method': request.method,
+                'path': request.path,
+                'route': getattr(request.resolver_match, 'view_name', None),
+                'status': response.status_code,
+                'queries': timings.queries,
+                'db_ms': round(timings.db_seconds * 1000, 2),
+                'serializer_ms': round(timings.serializer_seconds * 1000, 2),
+                'view_ms': round(view_seconds * 1000, 2),
+            }))
+
+        follow_stream(response, partial(measuring, timings), log)
+        return response
+
+
+class MetricsMiddleware:
+    """Record request, latency and query metrics, and serve METRICS_PATH.
+
+    It goes first in MIDDLEWARE, so the metrics path is answered before
+    the session and authentication middleware run. Every other request
+    is counted by route: the URL pattern's name, never the raw path, to
+    keep the number of series bounded. Streamed responses are recorded
+    once their content is sent, so their queries and latency count.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.path == settings.METRICS_PATH:
+            return metrics.metrics_view(request)
+
+        timings = RequestTimings()
+        start = time.perf_counter()
+        with counting_queries(timings):
+            response = self.get_response(request)
+
+        def record():
+            seconds = time.perf_counter() - start
+            match = request.resolver_match
+            route = match.view_name if match else 'unmatched'
+            method = request.method if request.method in METHODS else 'other'
+            metrics.REQUESTS.labels(route, method, response.status_code).inc()
+            metrics.REQUEST_LATENCY.labels(route, method).observe(seconds)
+            metrics.DB_QUERIES.labels(route).observe(timings.queries)
+            metrics.DB_LATENCY.labels(route).observe(timings.db_seconds)
+
+        follow_stream(response, partial(counting_queries, timings), record)
+        return response
@@ -0,0 +1,56 @@
+"""
+merge duplicate tags and ingredients before they get a unique constraint
+
+This runs in its own migration: on PostgreSQL the deletes leave deferred
+foreign key triggers pending until commit, and ALTER TABLE in the same
+transaction fails with "pending trigger events".
+"""
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_names(apps, schema_editor):
+    """Merge tags/ingredients sharing a (user, name) into the oldest row"""
+    Recipe = apps.get_model('core', 'Recipe')
+    for model_name, field_name in (
+        ('Tag', 'tags'),
+        ('Ingredient', 'ingredients'),
+    ):
+        model = apps.get_model('core', model_name)
+        through = getattr(Recipe, field_name).through
+        target = f'{model_name.lower()}_id'
+        duplicates = model.objects.values('user', 'name').annotate(
+            keep=Min('id'), total=Count('id'),
+        ).filter(total__gt=1)
+        for group in duplicates:
+            extra_ids = list(
+                model.objects.filter(
+                    user=group['user'], name=group['name'],
+                ).exclude(id=group['keep']).values_list('id', flat=True)
+            )
+            linked = set(
+                through.objects.filter(
+                    **{target: group['keep']}
+                ).values_list('recipe_id', flat=True)
+            )
+            moved = set(
+                through.objects.filter(
+                    **{f'{target}__in': extra_ids}
+                ).values_list('recipe_id', flat=True)
+            ) - linked
+            through.objects.bulk_create([
+                through(**{'recipe_id': recipe_id, target: group['keep']})
+                for recipe_id in moved
+            ])
+            model.objects.filter(id__in=extra_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_recipe_image'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_names, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 3.2.25 on 2026-10-18 01:40
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+SEARCH_VECTOR_SQL = """
+    setweight(to_tsvector('english', coalesce({row}title, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce({row}description, '')), 'B')
+"""
+
+CREATE_SEARCH_SQL = [
+    f"""
+    CREATE OR REPLACE FUNCTION core_recipe_search_vector_update()
+    RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector := {SEARCH_VECTOR_SQL.format(row='NEW.')};
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+    """,
+    """
+    CREATE TRIGGER core_recipe_search_vector_update
+    BEFORE INSERT OR UPDATE OF title, description ON core_recipe
+    FOR EACH ROW EXECUTE PROCEDURE core_recipe_search_vector_update();
+    """,
+    f"UPDATE core_recipe SET search_vector = {SEARCH_VECTOR_SQL.format(row='')};",
+    """
+    CREATE INDEX recipe_search_vector_gin
+    ON core_recipe USING gin (search_vector);
+    """,
+]
+
+DROP_SEARCH_SQL = [
+    "DROP INDEX IF EXISTS recipe_search_vector_gin;",
+    "DROP TRIGGER IF EXISTS core_recipe_search_vector_update ON core_recipe;",
+    "DROP FUNCTION IF EXISTS core_recipe_search_vector_update();",
+]
+
+
+def create_search_trigger(apps, schema_editor):
+    """Maintain and index the search vector on PostgreSQL only"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in CREATE_SEARCH_SQL:
+        schema_editor.execute(sql)
+
+
+def drop_search_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for sql in DROP_SEARCH_SQL:
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_user_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_trigger, drop_search_trigger),
+    ]
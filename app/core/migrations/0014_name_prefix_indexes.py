@@ -0,0 +1,37 @@
+from django.db import migrations
+
+# istartswith compiles to UPPER("name"::text) LIKE UPPER('q%') on
+# PostgreSQL; text_pattern_ops lets a btree serve that LIKE prefix match
+# under any collation, after the user_id equality
+CREATE_INDEX_SQL = """
+    CREATE INDEX IF NOT EXISTS {table}_user_name_prefix_idx
+    ON {table} (user_id, (UPPER(name::text)) text_pattern_ops);
+"""
+DROP_INDEX_SQL = "DROP INDEX IF EXISTS {table}_user_name_prefix_idx;"
+TABLES = ['core_tag', 'core_ingredient']
+
+
+def create_prefix_indexes(apps, schema_editor):
+    """Index case-insensitive name prefixes on PostgreSQL only"""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in TABLES:
+        schema_editor.execute(CREATE_INDEX_SQL.format(table=table))
+
+
+def drop_prefix_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for table in TABLES:
+        schema_editor.execute(DROP_INDEX_SQL.format(table=table))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_recipe_image_content_addressed'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_prefix_indexes, drop_prefix_indexes),
+    ]
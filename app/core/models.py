@@ -3,6 +3,7 @@ database models
 """
 
 from django.db import models
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import (
     BaseUserManager,
     AbstractBaseUser,
@@ -11,15 +12,21 @@ from django.contrib.auth.models import (
 
 from django.conf import settings
 
-import uuid
+from core.storage import ContentAddressedStorage
+
 import os
 
+recipe_image_storage = ContentAddressedStorage()
+
 def recipe_image_file_path(instance, file_name):
-    """generate file path for new recipe image. """
+    """generate file path for new recipe image.
+
+    only the extension is kept; recipe_image_storage names the file after
+    its SHA-256 so identical uploads share one file.
+    """
     ext = os.path.splitext(file_name)[1]
-    file_name = f'{uuid.uuid4()}{ext}'
 
-    return os.path.join('uploads','recipe',file_name)
+    return os.path.join('uploads', 'recipe', f'image{ext}')
 
 class UserManager(BaseUserManager):
     """manager for users."""
@@ -58,7 +65,8 @@ class User(AbstractBaseUser, PermissionsMixin):
 
 class Recipe(models.Model):
     """Recipe model"""
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # indexed by the (user, -id) index below
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
     title = models.CharField(max_length=255)
     time_minutes = models.IntegerField()
     price = models.DecimalField(max_digits=5, decimal_places=2)
@@ -66,7 +74,29 @@ class Recipe(models.Model):
     description = models.TextField(blank=True)
     tags = models.ManyToManyField('Tag')
     ingredients = models.ManyToManyField('Ingredient')
-    image = models.ImageField(null=True,upload_to=recipe_image_file_path)
+    # content addressed, so several recipes may share one file; indexed
+    # to count the references before a file is deleted
+    image = models.ImageField(
+        null=True,
+        db_index=True,
+        upload_to=recipe_image_file_path,
+        storage=recipe_image_storage,
+    )
+    # rendition name -> storage path, filled in by recipe.images once the
+    # current image has been processed
+    image_renditions = models.JSONField(default=dict, editable=False)
+    # weighted title/description vector, maintained by a database trigger
+    # and GIN indexed on PostgreSQL (see migration 0009)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # also bumped when the recipe's tags/ingredients change (recipe.signals)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['user', '-id'], name='recipe_user_id_desc_idx'
+            ),
+        ]
 
     def __str__(self):
         return self.title
@@ -74,17 +104,59 @@ class Recipe(models.Model):
 
 class Tag(models.Model):
     """Tag model"""
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # indexed by the (user, name) unique constraint below
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_index=False,
+    )
     name = models.CharField(max_length=255)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_tag_user_name',
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
 class Ingredient(models.Model):
     """Ingredients model"""
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    # indexed by the (user, name) unique constraint below
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        db_index=False,
+    )
     name = models.CharField(max_length=255)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'name'],
+                name='unique_ingredient_user_name',
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
+
+class RefreshToken(models.Model):
+    """Long-lived token exchanged for new access tokens"""
+    # sha256 of the token handed to the client, so a leaked table can't be
+    # replayed and lookups stay a single indexed query
+    key = models.CharField(max_length=64, primary_key=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='refresh_tokens',
+    )
+    created = models.DateTimeField(auto_now_add=True)
+    expires = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f'refresh token for {self.user}'
@@ -0,0 +1,57 @@
+"""
+signal handlers for core models
+"""
+from django.conf import settings
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from core.authentication import invalidate_token, revoke_tokens
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def token_changed(sender, instance, **kwargs):
+    """Drop a changed or deleted token from the auth caches"""
+    invalidate_token(instance.key)
+
+
+def password_changed(user):
+    """Return True if the user's password changed since it was loaded.
+
+    set_password() marks the user until it is saved. A hash assigned
+    directly is compared with the one remembered by remember_password;
+    a deferred password (see core.authentication) can't have changed.
+    """
+    if user._password is not None:
+        return True
+    loaded = user._loaded_password
+    return loaded is not None and user.__dict__.get('password') != loaded
+
+
+@receiver(post_init, sender=settings.AUTH_USER_MODEL)
+def remember_password(sender, instance, **kwargs):
+    """Keep the loaded password hash to notice it changing on save"""
+    instance._loaded_password = instance.__dict__.get('password')
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, created, **kwargs):
+    """Revoke or refresh the user's tokens.
+
+    Changing the password or deactivating the user deletes their access
+    and refresh tokens, so they must log in again. Any other save drops
+    the tokens from the auth caches, so the cached copy of the user is
+    refreshed on the next request.
+    """
+    revoke = password_changed(instance) or not instance.is_active
+    instance._loaded_password = instance.__dict__.get('password')
+    if created:
+        return
+    if revoke:
+        revoke_tokens(instance)
+        return
+    for key in Token.objects.filter(
+        user=instance
+    ).values_list('key', flat=True):
+        invalidate_token(key)
@@ -0,0 +1,78 @@
+"""
+content addressed file storage
+"""
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from django.utils.deconstruct import deconstructible
+
+
+class HashingFileUploadHandler(TemporaryFileUploadHandler):
+    """Stream uploads to a temporary file, hashing them on the way.
+
+    Uploads never sit in memory whatever their size, and the SHA-256 is
+    ready on the uploaded file as `sha256` by the time a view sees it.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.sha256 = hashlib.sha256()
+
+    def receive_data_chunk(self, raw_data, start):
+        self.sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        file.sha256 = self.sha256.hexdigest()
+        return file
+
+
+def file_sha256(content):
+    """Return the SHA-256 of a file, reusing the upload handler's digest"""
+    digest = getattr(content, 'sha256', None)
+    if digest is None:
+        sha256 = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            sha256.update(chunk)
+        content.seek(0)
+        digest = sha256.hexdigest()
+    return digest
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage that names files after their SHA-256.
+
+    Saving `uploads/recipe/x.jpg` stores the file as
+    `uploads/recipe/ab/cd/abcd....jpg`; saving identical content again
+    returns the existing name without writing anything, so each distinct
+    file is stored once. Callers decide when a file is no longer
+    referenced before deleting it.
+    """
+
+    def content_name(self, name, content):
+        digest = file_sha256(content)
+        ext = os.path.splitext(name)[1].lower()
+        return os.path.join(
+            os.path.dirname(name), digest[:2], digest[2:4], f'{digest}{ext}'
+        )
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if self.exists(name):
+            # refresh the mtime so media garbage collection treats the
+            # file as new and leaves it alone while the reference commits
+            os.utime(self.path(name))
+            return name
+        # two uploads racing to write the same new file can still leave a
+        # suffixed copy; it holds the same bytes, so both names stay valid
+        return self._save(name, content)
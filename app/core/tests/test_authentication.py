@@ -0,0 +1,143 @@
+"""
+tests for cached token authentication
+"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.authentication import (
+    TOKEN_CACHE_KEY,
+    CachedTokenAuthentication,
+    LocalTTLCache,
+    local_tokens,
+)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """test token lookups are cached and invalidated"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'testpass123'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.auth = CachedTokenAuthentication()
+
+    def authenticate(self, key=None):
+        request = APIRequestFactory().get(
+            '/', HTTP_AUTHORIZATION=f'Token {key or self.token.key}'
+        )
+        return self.auth.authenticate(Request(request))
+
+    def test_repeat_authentication_skips_database(self):
+        """test only the first request for a token queries the database"""
+        with self.assertNumQueries(1):
+            user, token = self.authenticate()
+        with self.assertNumQueries(0):
+            cached_user, cached_token = self.authenticate()
+
+        self.assertEqual(user, self.user)
+        self.assertEqual(cached_user, self.user)
+        self.assertEqual(cached_token.key, self.token.key)
+
+    def test_shared_cache_used_when_local_misses(self):
+        """test another process would find the token in the shared cache"""
+        self.authenticate()
+        local_tokens.clear()
+
+        with self.assertNumQueries(0):
+            user, token = self.authenticate()
+        self.assertEqual(user, self.user)
+
+    def test_cached_user_not_shared(self):
+        """test every request gets its own user instance"""
+        first, token = self.authenticate()
+        second, token = self.authenticate()
+
+        self.assertIsNot(first, second)
+        second.name = 'Changed'
+        self.assertNotEqual(self.authenticate()[0].name, 'Changed')
+
+    def test_password_not_cached(self):
+        """test the password hash is kept out of the caches"""
+        self.authenticate()
+
+        entry = cache.get(TOKEN_CACHE_KEY.format(key=self.token.key))
+        self.assertNotIn('password', entry['user'])
+        self.assertNotIn(self.user.password, repr(entry))
+        self.assertEqual(entry, local_tokens.get(self.token.key))
+        user, token = self.authenticate()
+        self.assertTrue(user.check_password('testpass123'))
+
+    def test_invalid_token(self):
+        """test unknown tokens are rejected"""
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate('not-a-token')
+
+    def test_token_delete_invalidates(self):
+        """test a deleted token stops authenticating"""
+        self.authenticate()
+        self.token.delete()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_user_deactivation_invalidates(self):
+        """test deactivating the user stops their token authenticating"""
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_password_change_invalidates(self):
+        """test changing the password stops the token authenticating"""
+        self.authenticate()
+        self.user.set_password('newpass123')
+        self.user.save()
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_other_changes_refresh_cached_user(self):
+        """test saving the user refreshes the cached copy"""
+        self.authenticate()
+        self.user.name = 'New name'
+        self.user.save()
+
+        with self.assertNumQueries(1):
+            user, token = self.authenticate()
+        self.assertEqual(user.name, 'New name')
+
+
+class LocalTTLCacheTests(TestCase):
+    """test the in-process token cache"""
+
+    def test_entries_expire(self):
+        """test entries are dropped once their ttl passes"""
+        local = LocalTTLCache(maxsize=10, ttl=5)
+        with patch('core.authentication.time.monotonic', return_value=100):
+            local.set('key', 'value')
+        with patch('core.authentication.time.monotonic', return_value=104):
+            self.assertEqual(local.get('key'), 'value')
+        with patch('core.authentication.time.monotonic', return_value=106):
+            self.assertIsNone(local.get('key'))
+
+    def test_least_recently_used_evicted(self):
+        """test the oldest unused entry is evicted when full"""
+        local = LocalTTLCache(maxsize=2, ttl=60)
+        local.set('a', 1)
+        local.set('b', 2)
+        local.get('a')
+        local.set('c', 3)
+
+        self.assertEqual(local.get('a'), 1)
+        self.assertIsNone(local.get('b'))
+        self.assertEqual(local.get('c'), 3)
@@ -1,9 +1,22 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+import json
+import os
+import shutil
+import tempfile
+import time
 from unittest.mock import patch
 from psycopg2 import OperationalError as Psycopg2Error
 
-from django.core.management import call_command
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
 from django.db.utils import OperationalError
-from django.test import SimpleTestCase
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from core.models import Recipe, RefreshToken, Tag
 
 
 @patch('core.management.commands.wait_for_db.Command.check')
@@ -28,3 +41,219 @@ class CommandTests(SimpleTestCase):
 
         self.assertEqual(patched_check.call_count, 6)
         patched_check.assert_called_with(databases=['default'])
+
+
+class CleanupTokensCommandTests(TestCase):
+    """ test deleting expired tokens """
+
+    @override_settings(ACCESS_TOKEN_LIFETIME=60)
+    def test_cleanup_tokens(self):
+        """ test only expired tokens are deleted, in batches """
+        now = timezone.now()
+        users = [
+            get_user_model().objects.create_user(f'user{i}@example.com')
+            for i in range(3)
+        ]
+        for i, user in enumerate(users):
+            Token.objects.create(user=user)
+            RefreshToken.objects.create(
+                key=f'key{i}', user=user,
+                expires=now + timedelta(days=1 if i else -1),
+            )
+        Token.objects.filter(user__in=users[1:]).update(
+            created=now - timedelta(minutes=5)
+        )
+
+        call_command('cleanup_tokens', batch_size=1, stdout=StringIO())
+
+        self.assertEqual(
+            list(Token.objects.values_list('user', flat=True)), [users[0].id]
+        )
+        self.assertEqual(
+            sorted(RefreshToken.objects.values_list('key', flat=True)),
+            ['key1', 'key2'],
+        )
+
+
+class GarbageCollectMediaCommandTests(TestCase):
+    """ test removing media files no recipe references """
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        user = get_user_model().objects.create_user('user@example.com')
+        live, orphan = 'abcd' * 16, 'ef01' * 16
+        for image in (
+            f'uploads/recipe/ab/cd/{live}.jpg', 'uploads/recipe/x.png',
+        ):
+            Recipe.objects.create(
+                user=user, title='Soup', time_minutes=5,
+                price=Decimal('1.00'), image=image,
+            )
+        self.live = [
+            f'uploads/recipe/ab/cd/{live}.jpg',
+            f'uploads/recipe/renditions/{live}-thumbnail.jpg',
+            'uploads/recipe/x.png',
+            'uploads/recipe/renditions/x-thumbnail.jpg',
+        ]
+        self.orphans = [
+            f'uploads/recipe/ef/01/{orphan}.jpg',
+            'uploads/recipe/old-uuid.png',
+            f'uploads/recipe/renditions/{orphan}-webp.webp',
+            # a stem the live image's name merely starts with
+            f'uploads/recipe/renditions/{live[:63]}-webp.webp',
+        ]
+        for name in self.live + self.orphans:
+            self.write(name, age=7200)
+        self.write('uploads/recipe/12/34/1234.jpg', age=0)
+
+    def write(self, name, age):
+        path = os.path.join(self.media_root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b'x')
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+
+    def remaining(self):
+        return sorted(
+            os.path.relpath(os.path.join(root, name), self.media_root)
+            for root, dirs, files in os.walk(self.media_root)
+            for name in files
+        )
+
+    def test_gc_media_dry_run(self):
+        """ test a dry run reports orphans without touching them """
+        before = self.remaining()
+        out = StringIO()
+
+        call_command('gc_media', dry_run=True, batch_size=2, stdout=out)
+
+        self.assertEqual(self.remaining(), before)
+        self.assertIn('would remove 4 orphans', out.getvalue())
+
+    def test_gc_media_deletes_old_orphans(self):
+        """ test only old unreferenced files are deleted """
+        call_command('gc_media', batch_size=2, stdout=StringIO())
+
+        self.assertEqual(self.remaining(), sorted(
+            self.live + ['uploads/recipe/12/34/1234.jpg']
+        ))
+
+    def test_gc_media_quarantine(self):
+        """ test orphans can be moved aside instead of deleted """
+        quarantine = os.path.join(self.media_root, 'quarantine')
+
+        call_command('gc_media', quarantine=quarantine, stdout=StringIO())
+
+        for name in self.orphans:
+            self.assertTrue(
+                os.path.exists(os.path.join(quarantine, name))
+            )
+            self.assertFalse(
+                os.path.exists(os.path.join(self.media_root, name))
+            )
+
+    @patch('core.management.commands.gc_media.time.sleep')
+    def test_gc_media_rate_limited(self, patched_sleep):
+        """ test removals are spaced out when a rate is given """
+        call_command('gc_media', rate=1, stdout=StringIO())
+
+        self.assertEqual(patched_sleep.call_count, 3)
+
+
+class ImportRecipesCommandTests(TestCase):
+    """ test bulk importing recipes """
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('user@example.com')
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(self.tmpdir, name)
+        with open(path, 'w') as f:
+            f.write(content)
+        return path
+
+    def run_import(self, path, **options):
+        out, err = StringIO(), StringIO()
+        call_command(
+            'import_recipes', path, user=self.user.email,
+            stdout=out, stderr=err, **options
+        )
+        return out.getvalue(), err.getvalue()
+
+    def test_import_ndjson(self):
+        """ test recipes import with shared tags resolved once """
+        rows = [
+            {'title': 'Soup', 'time_minutes': 5, 'price': '1.50',
+             'tags': ['Dinner'], 'ingredients': [{'name': 'Salt'}]},
+            {'title': 'Stew', 'time_minutes': 50, 'price': '4.00',
+             'tags': ['Dinner', 'Winter']},
+        ]
+        path = self.write(
+            'recipes.ndjson', ''.join(json.dumps(row) + '\n' for row in rows)
+        )
+
+        out, err = self.run_import(path, batch_size=1)
+
+        self.assertEqual(err, '')
+        self.assertIn('imported 2 recipes', out)
+        self.assertIn('rows/s', out)
+        stew = Recipe.objects.get(user=self.user, title='Stew')
+        self.assertEqual(
+            sorted(stew.tags.values_list('name', flat=True)),
+            ['Dinner', 'Winter'],
+        )
+        self.assertEqual(Tag.objects.filter(user=self.user).count(), 2)
+
+    def test_import_csv_skips_invalid_rows(self):
+        """ test CSV import reports bad rows and loads the rest """
+        path = self.write('recipes.csv', (
+            'title,time_minutes,price,tags,ingredients\n'
+            'Soup,5,1.50,Dinner; Quick,Salt\n'
+            'Broken,soon,1.00,,\n'
+            'Salad,10,3.00,,Lettuce\n'
+        ))
+
+        out, err = self.run_import(path)
+
+        self.assertIn('row 2', err)
+        self.assertIn('imported 2 recipes, skipped 1 invalid rows', out)
+        soup = Recipe.objects.get(user=self.user, title='Soup')
+        self.assertEqual(
+            sorted(soup.tags.values_list('name', flat=True)),
+            ['Dinner', 'Quick'],
+        )
+
+    def test_import_resumes_from_checkpoint(self):
+        """ test rows before the checkpoint are not imported again """
+        path = self.write('recipes.ndjson', '\n'.join(
+            json.dumps({'title': f'Recipe {i}', 'time_minutes': 5,
+                        'price': '1.00'})
+            for i in range(5)
+        ))
+        checkpoint = self.write('checkpoint.json', json.dumps({'rows': 3}))
+
+        self.run_import(path, checkpoint=checkpoint, batch_size=1)
+
+        self.assertEqual(
+            sorted(Recipe.objects.values_list('title', flat=True)),
+            ['Recipe 3', 'Recipe 4'],
+        )
+        with open(checkpoint) as f:
+            self.assertEqual(json.load(f), {'rows': 5})
+
+        self.run_import(path, checkpoint=checkpoint)
+        self.assertEqual(Recipe.objects.count(), 2)
+
+    def test_import_unknown_user(self):
+        """ test importing for a missing user fails cleanly """
+        path = self.write('recipes.ndjson', '')
+        with self.assertRaises(CommandError):
+            call_command('import_recipes', path, user='nobody@example.com')
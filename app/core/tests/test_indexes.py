@@ -0,0 +1,96 @@
+"""
+tests that the planner uses the per-user lookup indexes
+"""
+from decimal import Decimal
+import unittest
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+
+from core import models
+
+USERS = 50
+ROWS_PER_USER = 200
+
+
+@unittest.skipUnless(
+    connection.vendor == 'postgresql', 'EXPLAIN checks need PostgreSQL'
+)
+class IndexUsageTests(TestCase):
+    """test hot per-user queries are served by the composite indexes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        users = [
+            get_user_model().objects.create_user(f'user{i}@example.com')
+            for i in range(USERS)
+        ]
+        for model in (models.Tag, models.Ingredient):
+            model.objects.bulk_create([
+                model(user=user, name=f'name {i}')
+                for user in users
+                for i in range(ROWS_PER_USER)
+            ])
+        models.Recipe.objects.bulk_create([
+            models.Recipe(
+                user=user,
+                title=f'recipe {i}',
+                time_minutes=10,
+                price=Decimal('5.00'),
+            )
+            for user in users
+            for i in range(ROWS_PER_USER)
+        ])
+        with connection.cursor() as cursor:
+            for model in (models.Recipe, models.Tag, models.Ingredient):
+                cursor.execute(f'ANALYZE {model._meta.db_table}')
+        cls.user = users[0]
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan)
+        self.assertNotIn('Seq Scan', plan)
+
+    def test_recipe_list_uses_user_id_index(self):
+        """test listing a user's recipes newest first uses the index"""
+        queryset = models.Recipe.objects.filter(
+            user=self.user
+        ).order_by('-id')[:50]
+        self.assertUsesIndex(queryset, 'recipe_user_id_desc_idx')
+
+    def test_tag_list_uses_user_name_index(self):
+        """test listing a user's tags by name uses the unique index"""
+        queryset = models.Tag.objects.filter(
+            user=self.user
+        ).order_by('-name')[:50]
+        self.assertUsesIndex(queryset, 'unique_tag_user_name')
+
+    def test_ingredient_list_uses_user_name_index(self):
+        """test listing a user's ingredients by name uses the unique index"""
+        queryset = models.Ingredient.objects.filter(
+            user=self.user
+        ).order_by('-name')[:50]
+        self.assertUsesIndex(queryset, 'unique_ingredient_user_name')
+
+    def test_name_lookup_uses_user_name_index(self):
+        """test resolving names for a user uses the unique index"""
+        for model, index_name in (
+            (models.Tag, 'unique_tag_user_name'),
+            (models.Ingredient, 'unique_ingredient_user_name'),
+        ):
+            queryset = model.objects.filter(
+                user=self.user, name__in=['name 1', 'name 2', 'missing']
+            )
+            self.assertUsesIndex(queryset, index_name)
+
+    def test_autocomplete_uses_prefix_index(self):
+        """test case-insensitive name prefixes are matched on the index"""
+        for model, index_name in (
+            (models.Tag, 'core_tag_user_name_prefix_idx'),
+            (models.Ingredient, 'core_ingredient_user_name_prefix_idx'),
+        ):
+            queryset = model.objects.filter(
+                user=self.user, name__istartswith='NAME 199'
+            )
+            self.assertUsesIndex(queryset, index_name)
@@ -0,0 +1,196 @@
+"""
+tests for the prometheus metrics endpoint and middleware
+"""
+from decimal import Decimal
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from prometheus_client import REGISTRY, generate_latest
+from rest_framework.test import APIClient
+
+from core.metrics import metrics_registry
+from core.models import Recipe
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+
+class MetricsEndpointTests(TestCase):
+    """test the metrics endpoint and what it counts"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'password123'
+        )
+        self.client.force_authenticate(self.user)
+        Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5,
+            price=Decimal('1.00'),
+        )
+
+    @override_settings(METRICS_TOKEN='scraper-token')
+    def test_metrics_without_auth_or_session(self):
+        """test the endpoint is served before session and auth middleware"""
+        with patch(
+            'django.contrib.sessions.middleware.SessionMiddleware'
+            '.process_request'
+        ) as session, patch(
+            'django.contrib.auth.middleware.AuthenticationMiddleware'
+            '.process_request'
+        ) as auth:
+            res = APIClient().get(
+                settings.METRICS_PATH,
+                HTTP_AUTHORIZATION='Bearer scraper-token',
+            )
+
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res['Content-Type'].startswith('text/plain'))
+        self.assertIn(b'http_requests_total', res.content)
+        session.assert_not_called()
+        auth.assert_not_called()
+
+    @override_settings(METRICS_TOKEN='scraper-token')
+    def test_metrics_token_required(self):
+        """test scrapers without the right bearer token are turned away"""
+        for authorization in ('', 'Bearer wrong', 'Token scraper-token'):
+            res = APIClient().get(
+                settings.METRICS_PATH, HTTP_AUTHORIZATION=authorization
+            )
+
+            self.assertEqual(res.status_code, 401)
+            self.assertNotIn(b'http_requests_total', res.content)
+
+    @override_settings(METRICS_TOKEN='')
+    def test_metrics_off_without_token(self):
+        """test the endpoint doesn't exist until a token is configured"""
+        res = APIClient().get(settings.METRICS_PATH)
+
+        self.assertEqual(res.status_code, 404)
+
+    @override_settings(RECIPE_LIST_CACHE_TIMEOUT=0)
+    def test_request_metrics_by_route(self):
+        """test requests are counted and timed under their route name"""
+        labels = {'route': 'recipe:recipe-list', 'method': 'GET'}
+        requests = sample('http_requests_total', status='200', **labels)
+        timed = sample('http_request_duration_seconds_count', **labels)
+        queries = sample(
+            'http_request_db_queries_sum', route='recipe:recipe-list'
+        )
+
+        with self.assertNumQueries(4):
+            self.client.get(RECIPE_URL)
+
+        self.assertEqual(
+            sample('http_requests_total', status='200', **labels),
+            requests + 1,
+        )
+        self.assertEqual(
+            sample('http_request_duration_seconds_count', **labels),
+            timed + 1,
+        )
+        self.assertEqual(
+            sample('http_request_db_queries_sum', route='recipe:recipe-list'),
+            queries + 4,
+        )
+
+    def test_streamed_queries_counted(self):
+        """test queries run while a response streams are recorded"""
+        route = 'recipe:recipe-export'
+        requests = sample(
+            'http_requests_total', route=route, method='GET', status='200'
+        )
+        queries = sample('http_request_db_queries_sum', route=route)
+
+        res = self.client.get(reverse(route))
+        self.assertEqual(sample(
+            'http_requests_total', route=route, method='GET', status='200'
+        ), requests)
+        b''.join(res.streaming_content)
+
+        self.assertEqual(sample(
+            'http_requests_total', route=route, method='GET', status='200'
+        ), requests + 1)
+        self.assertEqual(
+            sample('http_request_db_queries_sum', route=route), queries + 3
+        )
+
+    def test_unmatched_paths_share_a_route(self):
+        """test 404s don't add a series per path"""
+        before = sample(
+            'http_requests_total',
+            route='unmatched', method='GET', status='404',
+        )
+
+        self.client.get('/no/such/path/')
+
+        self.assertEqual(sample(
+            'http_requests_total',
+            route='unmatched', method='GET', status='404',
+        ), before + 1)
+
+    @override_settings(RECIPE_LIST_CACHE_TIMEOUT=60)
+    def test_cache_hits_and_misses(self):
+        """test the list cache reports a miss then a hit"""
+        misses = sample(
+            'cache_requests_total', cache='recipe_list', result='miss'
+        )
+        hits = sample(
+            'cache_requests_total', cache='recipe_list', result='hit'
+        )
+
+        self.client.get(RECIPE_URL, {'search': 'soup'})
+        self.client.get(RECIPE_URL, {'search': 'soup'})
+
+        self.assertEqual(sample(
+            'cache_requests_total', cache='recipe_list', result='miss'
+        ), misses + 1)
+        self.assertEqual(sample(
+            'cache_requests_total', cache='recipe_list', result='hit'
+        ), hits + 1)
+
+
+class MultiProcessMetricsTests(TestCase):
+    """test counters of several worker processes are added up"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+
+    def run_worker(self, increments):
+        """Count requests in a separate process, as a uwsgi worker would"""
+        subprocess.run(
+            [sys.executable, '-c', (
+                'from core.metrics import REQUESTS\n'
+                f'for i in range({increments}):\n'
+                "    REQUESTS.labels('recipe:recipe-list', 'GET', 200).inc()\n"
+            )],
+            cwd=settings.BASE_DIR,
+            env=dict(os.environ, PROMETHEUS_MULTIPROC_DIR=self.directory),
+            check=True,
+        )
+
+    def test_workers_aggregated(self):
+        """test the endpoint reports the sum over four workers"""
+        for increments in (3, 5, 7, 11):
+            self.run_worker(increments)
+
+        with patch.dict(os.environ, PROMETHEUS_MULTIPROC_DIR=self.directory):
+            output = generate_latest(metrics_registry()).decode()
+
+        self.assertIn(
+            'http_requests_total{method="GET",'
+            'route="recipe:recipe-list",status="200"} 26.0',
+            output,
+        )
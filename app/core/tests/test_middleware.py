@@ -0,0 +1,128 @@
+"""
+tests for the request timing middleware
+"""
+from decimal import Decimal
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.instrumentation import (
+    RequestTimings,
+    current_timings,
+    recording,
+    serializing,
+)
+from core.middleware import server_timing
+from core.models import Recipe
+
+RECIPE_URL = reverse('recipe:recipe-list')
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+def parse_server_timing(header):
+    """Return {name: (duration, description)} from a Server-Timing value"""
+    metrics = {}
+    for metric in header.split(', '):
+        name, *params = metric.split(';')
+        values = dict(param.split('=', 1) for param in params)
+        metrics[name] = (float(values['dur']), values.get('desc'))
+    return metrics
+
+
+@override_settings(REQUEST_TIMING_SAMPLE_RATE=1, RECIPE_LIST_CACHE_TIMEOUT=0)
+class RequestTimingMiddlewareTests(TestCase):
+    """test sampled requests report their timings"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'password123'
+        )
+        self.client.force_authenticate(self.user)
+        for i in range(3):
+            Recipe.objects.create(
+                user=self.user, title=f'Recipe {i}', time_minutes=5,
+                price=Decimal('1.00'),
+            )
+
+    def test_server_timing_header(self):
+        """test the header carries query count and durations"""
+        with self.assertNumQueries(4), self.assertLogs('core.middleware'):
+            res = self.client.get(RECIPE_URL)
+
+        metrics = parse_server_timing(res['Server-Timing'])
+        self.assertEqual(metrics['db'][1], '"4 queries"')
+        self.assertGreater(metrics['db'][0], 0)
+        self.assertGreater(metrics['serializer'][0], 0)
+        self.assertGreaterEqual(
+            metrics['view'][0], metrics['db'][0] + metrics['serializer'][0]
+        )
+
+    def test_structured_log_line(self):
+        """test one JSON log line per sampled request"""
+        with self.assertLogs('core.middleware', 'INFO') as logs:
+            self.client.get(reverse('recipe:recipe-detail', args=[
+                Recipe.objects.first().id
+            ]))
+
+        self.assertEqual(len(logs.records), 1)
+        line = json.loads(logs.records[0].getMessage())
+        self.assertEqual(line['route'], 'recipe:recipe-detail')
+        self.assertEqual(line['status'], 200)
+        self.assertEqual(line['queries'], 4)
+        self.assertGreater(line['serializer_ms'], 0)
+
+    def test_streamed_queries_counted(self):
+        """test the log line waits for a streamed response's content"""
+        with self.assertLogs('core.middleware', 'INFO') as logs:
+            res = self.client.get(EXPORT_URL)
+            self.assertEqual(len(logs.records), 0)
+            b''.join(res.streaming_content)
+
+        self.assertEqual(len(logs.records), 1)
+        line = json.loads(logs.records[0].getMessage())
+        # one cursor query plus the tags and ingredients of the chunk
+        self.assertEqual(line['queries'], 3)
+        self.assertIn('Server-Timing', res)
+
+    @override_settings(REQUEST_TIMING_SAMPLE_RATE=0)
+    def test_not_sampled(self):
+        """test requests outside the sample are left alone"""
+        res = self.client.get(RECIPE_URL)
+
+        self.assertNotIn('Server-Timing', res)
+
+
+class SerializerTimingTests(SimpleTestCase):
+    """test serializer time is counted once for nested serializers"""
+
+    def test_nested_serializing_counted_once(self):
+        """test only the outermost serializer adds its time"""
+        timings = RequestTimings()
+        with recording(timings):
+            with serializing():
+                with serializing():
+                    pass
+                outer = timings.serializer_seconds
+
+        self.assertEqual(outer, 0)
+        self.assertGreater(timings.serializer_seconds, 0)
+
+    def test_outside_request(self):
+        """test serializing without a sampled request records nothing"""
+        with serializing():
+            self.assertIsNone(current_timings())
+
+    def test_header_format(self):
+        """test durations are in milliseconds"""
+        timings = RequestTimings()
+        timings.queries, timings.db_seconds = 2, 0.0015
+
+        self.assertEqual(
+            server_timing(timings, 0.01),
+            'db;dur=1.50;desc="2 queries", serializer;dur=0.00, '
+            'view;dur=10.00',
+        )
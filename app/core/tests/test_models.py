@@ -1,7 +1,10 @@
+import hashlib
+
 from django.test import TestCase
+from django.db import IntegrityError
 from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
 from core import models
-from unittest.mock import patch
 
 def create_user(email='user@example.com',password='testpass123'):
     """ create and return new user"""
@@ -64,11 +67,30 @@ class ModelTests(TestCase):
             )
         self.assertEqual(str(ingredient), ingredient.name)
 
-    @patch('core.models.uuid.uuid4')
-    def test_recipe_file_name_uuid(self, mock_uuid):
-        """Test genetaing image path."""
-        uuid = 'test-uuid'
-        mock_uuid.return_value = uuid
-        file_path = models.recipe_image_file_path(None,'example.jpg')
+    def test_tag_name_unique_per_user(self):
+        """test a user cannot have two tags with the same name"""
+        user = create_user()
+        other = create_user(email='other@example.com')
+        models.Tag.objects.create(user=user, name='dinner')
+        models.Tag.objects.create(user=other, name='dinner')
+        with self.assertRaises(IntegrityError):
+            models.Tag.objects.create(user=user, name='dinner')
+
+    def test_ingredient_name_unique_per_user(self):
+        """test a user cannot have two ingredients with the same name"""
+        user = create_user()
+        models.Ingredient.objects.create(user=user, name='salt')
+        with self.assertRaises(IntegrityError):
+            models.Ingredient.objects.create(user=user, name='salt')
+
+    def test_recipe_file_name_content_hash(self):
+        """Test genetaing image path from the file's SHA-256."""
+        file_path = models.recipe_image_file_path(None, 'example.JPG')
+        content = ContentFile(b'image bytes')
+        digest = hashlib.sha256(b'image bytes').hexdigest()
 
-        self.assertEqual(file_path,f'uploads/recipe/{uuid}.jpg')
\ No newline at end of file
+        name = models.recipe_image_storage.content_name(file_path, content)
+
+        self.assertEqual(
+            name, f'uploads/recipe/{digest[:2]}/{digest[2:4]}/{digest}.jpg'
+        )
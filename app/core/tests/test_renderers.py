@@ -0,0 +1,125 @@
+"""
+tests for the orjson and msgpack renderers and parser
+"""
+from datetime import datetime, timezone
+from decimal import Decimal
+from io import BytesIO
+import json
+import unittest
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+from core.renderers import (
+    MessagePackRenderer,
+    ORJSONParser,
+    ORJSONRenderer,
+    msgpack,
+)
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    """test orjson output matches JSONRenderer"""
+
+    def test_same_bytes_as_json_renderer(self):
+        """test typical api data renders identically"""
+        data = {
+            'id': 1,
+            'title': 'Crème brûlée ☕',
+            'price': '5.99',
+            'tags': [{'id': 2, 'name': 'Dessert'}],
+            'link': '',
+            'image': None,
+            'ratio': 0.5,
+            'created': datetime(2021, 5, 1, 12, 0, 0, 123456, timezone.utc),
+            7: 'non string key',
+        }
+
+        self.assertEqual(
+            ORJSONRenderer().render(data), JSONRenderer().render(data)
+        )
+
+    def test_decimal_rendered_as_exact_string(self):
+        """test raw decimals keep their digits"""
+        data = {'price': Decimal('12345678.10')}
+
+        self.assertEqual(
+            ORJSONRenderer().render(data), b'{"price":"12345678.10"}'
+        )
+
+    def test_line_separators_escaped(self):
+        """test U+2028 and U+2029 are escaped like JSONRenderer does"""
+        data = {'title': 'a\u2028b\u2029c'}
+
+        self.assertEqual(
+            ORJSONRenderer().render(data), JSONRenderer().render(data)
+        )
+
+    def test_indent_from_accept_header(self):
+        """test an indent media type parameter pretty prints"""
+        rendered = ORJSONRenderer().render(
+            {'id': 1}, 'application/json; indent=4'
+        )
+
+        self.assertEqual(rendered, b'{\n  "id": 1\n}')
+
+    def test_parse(self):
+        """test request bodies parse with decimals as floats like json"""
+        body = '{"title": "Crème", "price": 5.99, "tags": []}'.encode()
+
+        data = ORJSONParser().parse(BytesIO(body))
+
+        self.assertEqual(data, json.loads(body))
+
+    def test_parse_error(self):
+        """test malformed bodies raise ParseError"""
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(BytesIO(b'{"title": '))
+
+        with self.assertRaises(ParseError):
+            ORJSONParser().parse(BytesIO(b'{"price": NaN}'))
+
+
+@unittest.skipIf(msgpack is None, 'msgpack is not installed')
+class MessagePackRendererTests(TestCase):
+    """test recipes can be fetched as MessagePack"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'password123'
+        )
+        self.client.force_authenticate(self.user)
+        recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5,
+            price=Decimal('5.50'),
+        )
+        recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+
+    def test_render_decimal(self):
+        """test decimals pack as strings"""
+        rendered = MessagePackRenderer().render({'price': Decimal('5.50')})
+
+        self.assertEqual(msgpack.unpackb(rendered), {'price': '5.50'})
+
+    def test_selected_by_accept(self):
+        """test the list negotiates msgpack and carries the same data"""
+        res = self.client.get(RECIPE_URL, HTTP_ACCEPT='application/msgpack')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res['Content-Type'], 'application/msgpack')
+        json_res = self.client.get(RECIPE_URL)
+        self.assertEqual(msgpack.unpackb(res.content), json_res.json())
+
+    def test_json_by_default(self):
+        """test clients without an Accept header still get JSON"""
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res['Content-Type'], 'application/json')
@@ -0,0 +1,111 @@
+"""
+tests for content addressed storage and hashing uploads
+"""
+import hashlib
+import os
+import random
+import shutil
+import tempfile
+import tracemalloc
+
+from django.core.files.base import ContentFile
+from django.core.handlers.wsgi import WSGIRequest
+from django.test import SimpleTestCase, override_settings
+from django.test.client import RequestFactory
+
+from core.storage import ContentAddressedStorage
+
+BOUNDARY = 'streamedboundary'
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+class StreamedMultipartBody:
+    """A multipart body with one file of random bytes, generated lazily.
+
+    Only one chunk of the file exists in memory at a time, so the test
+    measures the upload path rather than the body it is fed.
+    """
+
+    def __init__(self, size, chunk_size=64 * 1024, seed=0):
+        self.head = (
+            f'--{BOUNDARY}\r\n'
+            'Content-Disposition: form-data; name="image"; '
+            'filename="big.jpg"\r\n'
+            'Content-Type: image/jpeg\r\n\r\n'
+        ).encode()
+        self.tail = f'\r\n--{BOUNDARY}--\r\n'.encode()
+        self.length = len(self.head) + size + len(self.tail)
+        self.remaining = size
+        self.chunk_size = chunk_size
+        self.rng = random.Random(seed)
+        self.sha256 = hashlib.sha256()
+        self.buffer = self.head
+
+    def read(self, size=-1):
+        if size < 0:
+            size = self.length
+        while len(self.buffer) < size and (self.remaining or self.tail):
+            if self.remaining:
+                chunk = self.rng.randbytes(
+                    min(self.chunk_size, self.remaining)
+                )
+                self.remaining -= len(chunk)
+                self.sha256.update(chunk)
+            else:
+                chunk, self.tail = self.tail, b''
+            self.buffer += chunk
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class ContentAddressedStorageTests(SimpleTestCase):
+    """test files are stored once under their hash"""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.storage = ContentAddressedStorage()
+
+    def test_identical_content_stored_once(self):
+        """test saving the same bytes twice returns the same file"""
+        first = self.storage.save('uploads/a.jpg', ContentFile(b'same'))
+        second = self.storage.save('uploads/b.jpg', ContentFile(b'same'))
+        other = self.storage.save('uploads/c.jpg', ContentFile(b'other'))
+
+        self.assertEqual(first, second)
+        self.assertNotEqual(first, other)
+        digest = hashlib.sha256(b'same').hexdigest()
+        self.assertEqual(os.path.basename(first), f'{digest}.jpg')
+        self.assertEqual(
+            os.listdir(os.path.dirname(self.storage.path(first))),
+            [f'{digest}.jpg'],
+        )
+
+    def test_streamed_upload_memory_is_flat(self):
+        """test a 10 MB upload is hashed and stored in bounded memory"""
+        body = StreamedMultipartBody(10 * 1024 * 1024)
+        environ = RequestFactory()._base_environ(
+            REQUEST_METHOD='POST',
+            CONTENT_TYPE=f'multipart/form-data; boundary={BOUNDARY}',
+            CONTENT_LENGTH=str(body.length),
+            **{'wsgi.input': body},
+        )
+
+        tracemalloc.start()
+        try:
+            upload = WSGIRequest(environ).FILES['image']
+            name = self.storage.save('uploads/recipe/image.jpg', upload)
+            peak = tracemalloc.get_traced_memory()[1]
+            upload.close()
+        finally:
+            tracemalloc.stop()
+
+        digest = body.sha256.hexdigest()
+        self.assertEqual(upload.sha256, digest)
+        self.assertEqual(os.path.basename(name), f'{digest}.jpg')
+        self.assertEqual(self.storage.size(name), 10 * 1024 * 1024)
+        self.assertLess(peak, 1024 * 1024)
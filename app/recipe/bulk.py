@@ -0,0 +1,240 @@
+""" set-based helpers for writing recipe tags and ingredients """
+from django.db import connection
+from django.db.models.signals import m2m_changed
+from django.utils import timezone
+
+from core.models import Ingredient, Recipe, Tag
+from recipe.cache import bump_user_version
+
+
+def resolve_names(model, user, names):
+    """Return a {name: object} map for the user, creating missing names.
+
+    Existing objects are fetched with one `IN` lookup and the missing
+    ones are inserted with a single `bulk_create`. Names created
+    concurrently by another request are skipped by the unique
+    `(user, name)` constraint and picked up by the follow-up lookup.
+    """
+    names = list(dict.fromkeys(names))
+    if not names:
+        return {}
+    resolved = {
+        obj.name: obj
+        for obj in model.objects.filter(user=user, name__in=names)
+    }
+    missing = [name for name in names if name not in resolved]
+    if missing:
+        model.objects.bulk_create(
+            [model(user=user, name=name) for name in missing],
+            ignore_conflicts=True,
+        )
+        bump_user_version(user.pk)
+        resolved.update({
+            obj.name: obj
+            for obj in model.objects.filter(user=user, name__in=missing)
+        })
+    return resolved
+
+
+def _relation(field_name):
+    """Return the through model and its column names for a recipe m2m"""
+    field = Recipe._meta.get_field(field_name)
+    return (
+        field.remote_field.through,
+        f'{field.m2m_field_name()}_id',
+        f'{field.m2m_reverse_field_name()}_id',
+        field.related_model,
+    )
+
+
+def _send_m2m_changed(through, model, recipe, action, pk_set):
+    """Send the m2m_changed signal `recipe.<field>.add()` would send.
+
+    The extra `bulk` argument tells this app's receivers that the caller
+    refreshes the recipes' timestamps and cached lists itself, once for
+    the whole batch (see `touch_recipes`).
+    """
+    m2m_changed.send(
+        sender=through,
+        instance=recipe,
+        action=action,
+        reverse=False,
+        model=model,
+        pk_set=pk_set,
+        using=recipe._state.db,
+        bulk=True,
+    )
+
+
+def touch_recipes(recipes):
+    """Mark recipes as modified with one `UPDATE` and invalidate caches"""
+    recipes = list(recipes)
+    if not recipes:
+        return
+    now = timezone.now()
+    Recipe.objects.filter(
+        pk__in=[recipe.pk for recipe in recipes]
+    ).update(updated_at=now)
+    for recipe in recipes:
+        recipe.updated_at = now
+    for user_id in {recipe.user_id for recipe in recipes}:
+        bump_user_version(user_id)
+
+
+def _insert_links(field_name, pending):
+    """Insert through rows for `(recipe, pk_set)` pairs in one statement"""
+    through, source, target, model = _relation(field_name)
+    for recipe, pk_set in pending:
+        _send_m2m_changed(through, model, recipe, 'pre_add', pk_set)
+    through.objects.bulk_create([
+        through(**{source: recipe.pk, target: pk})
+        for recipe, pk_set in pending
+        for pk in pk_set
+    ])
+    for recipe, pk_set in pending:
+        _send_m2m_changed(through, model, recipe, 'post_add', pk_set)
+
+
+def add_related(field_name, recipe_objects):
+    """Link recipes to related objects with one through-table insert.
+
+    `recipe_objects` is an iterable of `(recipe, objects)` pairs. The
+    recipes must not already be linked to the given objects.
+    """
+    pending = [
+        (recipe, {obj.pk for obj in objects})
+        for recipe, objects in recipe_objects
+    ]
+    pending = [(recipe, pk_set) for recipe, pk_set in pending if pk_set]
+    if pending:
+        _insert_links(field_name, pending)
+        touch_recipes(recipe for recipe, pk_set in pending)
+
+
+def sync_related(field_name, recipe_objects):
+    """Make each recipe's related objects exactly the given objects.
+
+    `recipe_objects` is an iterable of `(recipe, objects)` pairs. Only the
+    through rows that differ from the current ones are deleted or
+    inserted, with one statement each for all the recipes; rows that stay
+    linked are left untouched.
+    """
+    through, source, target, model = _relation(field_name)
+    desired = {
+        recipe.pk: (recipe, {obj.pk for obj in objects})
+        for recipe, objects in recipe_objects
+    }
+    if not desired:
+        return
+    current = {}
+    for row_id, recipe_id, target_id in through.objects.filter(
+        **{f'{source}__in': list(desired)}
+    ).values_list('id', source, target):
+        current.setdefault(recipe_id, {})[target_id] = row_id
+
+    removed, added = [], []
+    for recipe, pk_set in desired.values():
+        linked = current.get(recipe.pk, {})
+        if set(linked) - pk_set:
+            removed.append((recipe, set(linked) - pk_set))
+        if pk_set - set(linked):
+            added.append((recipe, pk_set - set(linked)))
+
+    if removed:
+        for recipe, pk_set in removed:
+            _send_m2m_changed(through, model, recipe, 'pre_remove', pk_set)
+        through.objects.filter(id__in=[
+            current[recipe.pk][pk]
+            for recipe, pk_set in removed
+            for pk in pk_set
+        ]).delete()
+        for recipe, pk_set in removed:
+            _send_m2m_changed(through, model, recipe, 'post_remove', pk_set)
+    if added:
+        _insert_links(field_name, added)
+    touch_recipes({
+        recipe.pk: recipe for recipe, pk_set in removed + added
+    }.values())
+
+
+def save_recipes(recipes):
+    """Insert new recipes, in one statement where the backend allows it.
+
+    Backends that can't return primary keys from a bulk insert fall back
+    to saving the recipes one by one so the related rows can be linked.
+    """
+    if connection.features.can_return_rows_from_bulk_insert:
+        Recipe.objects.bulk_create(recipes)
+        # bulk_create sends no post_save, so invalidate caches here
+        for user_id in {recipe.user_id for recipe in recipes}:
+            bump_user_version(user_id)
+        return recipes
+    for recipe in recipes:
+        recipe.save()
+    return recipes
+
+
+def create_recipes(user, items):
+    """Create recipes with their tags and ingredients from validated data.
+
+    Tags and ingredients for every recipe are resolved together, so the
+    number of statements does not depend on how many recipes there are.
+    """
+    items = [dict(item) for item in items]
+    related = [
+        (item.pop('tags', []), item.pop('ingredients', []))
+        for item in items
+    ]
+    recipes = save_recipes([Recipe(user=user, **item) for item in items])
+    _link_names(user, recipes, related, sync=False)
+    return recipes
+
+
+def update_recipes(user, pairs):
+    """Apply validated partial updates to recipes in bulk.
+
+    `pairs` is an iterable of `(recipe, validated_data)`. Scalar fields
+    are written with one `bulk_update`; tags and ingredients are synced
+    only for the recipes whose payload included them.
+    """
+    recipes, related, fields = [], [], set()
+    for recipe, data in pairs:
+        data = dict(data)
+        related.append((data.pop('tags', None), data.pop('ingredients', None)))
+        for attr, value in data.items():
+            setattr(recipe, attr, value)
+            fields.add(attr)
+        recipes.append(recipe)
+    if fields:
+        # bulk_update skips auto_now, so set the timestamp explicitly
+        now = timezone.now()
+        for recipe in recipes:
+            recipe.updated_at = now
+        Recipe.objects.bulk_update(recipes, sorted(fields | {'updated_at'}))
+        bump_user_version(user.pk)
+    _link_names(user, recipes, related, sync=True)
+    return recipes
+
+
+def _link_names(user, recipes, related, sync):
+    """Resolve tag/ingredient names for many recipes and link them"""
+    for index, (field_name, model) in enumerate((
+        ('tags', Tag),
+        ('ingredients', Ingredient),
+    )):
+        wanted = [
+            (recipe, items[index])
+            for recipe, items in zip(recipes, related)
+            if items[index] is not None
+        ]
+        resolved = resolve_names(model, user, [
+            item['name'] for recipe, items in wanted for item in items
+        ])
+        recipe_objects = [
+            (recipe, [resolved[item['name']] for item in items])
+            for recipe, items in wanted
+        ]
+        if sync:
+            sync_related(field_name, recipe_objects)
+        else:
+            add_related(field_name, recipe_objects)
@@ -0,0 +1,162 @@
+""" response caching and conditional requests for the recipe api """
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+from rest_framework.response import Response
+
+from core.metrics import record_cache
+
+VERSION_KEY = 'recipe:version:{user_id}'
+LIST_KEY = 'recipe:list:{user_id}:{version}:{view}:{format}:{params}'
+
+
+def get_user_version(user_id):
+    """Return the user's current cache version, starting one if needed"""
+    key = VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        # start from the clock so a lost counter never reuses old entries
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _incr_user_version(user_id):
+    key = VERSION_KEY.format(user_id=user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def bump_user_version(user_id):
+    """Invalidate every cached list response of the user.
+
+    The version is bumped straight away and again once the current
+    transaction commits, so a response cached from another request
+    before the commit can't outlive the change.
+    """
+    _incr_user_version(user_id)
+    transaction.on_commit(lambda: _incr_user_version(user_id))
+
+
+def list_cache_key(request, view_name):
+    """Build the cache key for a list request of the user"""
+    params = sorted(
+        (key, sorted(values)) for key, values in request.query_params.lists()
+    )
+    return LIST_KEY.format(
+        user_id=request.user.pk,
+        version=get_user_version(request.user.pk),
+        view=view_name,
+        format=request.accepted_renderer.format,
+        params=hashlib.sha1(repr(params).encode()).hexdigest(),
+    )
+
+
+class CachedListMixin:
+    """Serve list responses from the cache until the user's data changes.
+
+    The ETag is cached with the data, so a cached list also answers
+    conditional requests without touching the database.
+    """
+    cached_headers = ('ETag', 'Vary')
+
+    def list(self, request, *args, **kwargs):
+        timeout = settings.RECIPE_LIST_CACHE_TIMEOUT
+        if not timeout:
+            return super().list(request, *args, **kwargs)
+
+        key = list_cache_key(request, self.basename)
+        cached = cache.get(key)
+        record_cache('recipe_list', cached is not None)
+        if cached is not None:
+            data, headers = cached
+            not_modified = get_conditional_response(
+                request._request, etag=headers.get('ETag'),
+            )
+            return not_modified or Response(data, headers=headers)
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == 200:
+            headers = {
+                name: response[name]
+                for name in self.cached_headers if response.has_header(name)
+            }
+            cache.set(key, (response.data, headers), timeout)
+        return response
+
+
+class ConditionalGetMixin:
+    """Answer conditional list and detail requests from `updated_at`.
+
+    The validators are worked out before anything is serialized: a single
+    aggregate query for lists and a single-column lookup for details, so
+    an unchanged resource costs one query and an empty 304 response.
+    Lists only get an ETag: deleting a recipe, or one leaving a filtered
+    list, changes the count but not the latest `updated_at`, so a
+    Last-Modified date would answer If-Modified-Since with a stale 304.
+    """
+
+    def list(self, request, *args, **kwargs):
+        stats = self.filter_queryset(
+            self.get_queryset()
+        ).prefetch_related(None).order_by().aggregate(
+            count=Count('id'), latest=Max('updated_at'),
+        )
+        etag = self._etag(
+            request, 'list', stats['count'], stats['latest']
+        )
+        return self._conditional(
+            request, etag, None, super().list, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        try:
+            latest = self.get_queryset().prefetch_related(None).filter(
+                **{self.lookup_field: kwargs[lookup]}
+            ).values_list('updated_at', flat=True).first()
+        except (TypeError, ValueError, ValidationError):
+            # a malformed lookup value; get_object() answers it with a 404
+            latest = None
+        if latest is None:
+            return super().retrieve(request, *args, **kwargs)
+        etag = self._etag(request, kwargs[lookup], latest)
+        return self._conditional(
+            request, etag, latest, super().retrieve, *args, **kwargs
+        )
+
+    def _etag(self, request, *parts):
+        params = sorted(
+            (key, sorted(values))
+            for key, values in request.query_params.lists()
+        )
+        # JSON and MessagePack bodies of a resource are different entities
+        digest = hashlib.sha1(repr((
+            request.user.pk, parts, params, request.accepted_renderer.format,
+        )).encode()).hexdigest()
+        return quote_etag(digest)
+
+    def _conditional(self, request, etag, latest, handler, *args, **kwargs):
+        last_modified = int(latest.timestamp()) if latest else None
+        not_modified = get_conditional_response(
+            request._request, etag=etag, last_modified=last_modified,
+        )
+        if not_modified is not None:
+            return not_modified
+
+        response = handler(request, *args, **kwargs)
+        patch_vary_headers(response, ['Accept'])
+        if response.status_code == 200:
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+        return response
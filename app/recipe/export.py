@@ -0,0 +1,70 @@
+""" streaming exports of a user's recipes """
+import csv
+
+from django.db.models import prefetch_related_objects
+from rest_framework.utils.encoders import JSONEncoder
+
+CSV_COLUMNS = [
+    'id', 'title', 'time_minutes', 'price', 'link', 'description',
+    'tags', 'ingredients',
+]
+
+
+def iter_chunks(queryset, chunk_size):
+    """Yield lists of recipes with their tags and ingredients prefetched.
+
+    `iterator()` ignores prefetch_related, so rows are streamed from the
+    database cursor and every chunk gets its own two prefetch queries.
+    """
+    chunk = []
+    for recipe in queryset.prefetch_related(None).iterator(chunk_size):
+        chunk.append(recipe)
+        if len(chunk) >= chunk_size:
+            prefetch_related_objects(chunk, 'tags', 'ingredients')
+            yield chunk
+            chunk = []
+    if chunk:
+        prefetch_related_objects(chunk, 'tags', 'ingredients')
+        yield chunk
+
+
+def iter_rows(queryset, serializer_class, chunk_size):
+    """Yield the serialized recipes a chunk at a time"""
+    for chunk in iter_chunks(queryset, chunk_size):
+        rows = serializer_class(chunk, many=True).data
+        # prefetched querysets point back at their recipe, and the cycle
+        # would keep every chunk alive until a full garbage collection
+        for recipe in chunk:
+            recipe._prefetched_objects_cache = {}
+        yield from rows
+
+
+def ndjson_lines(rows):
+    encoder = JSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(row) + '\n'
+
+
+class _Echo:
+    """File-like object handing back what csv.writer writes to it"""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    """Yield CSV lines, listing tag and ingredient names in one cell each"""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for row in rows:
+        yield writer.writerow([
+            '; '.join(item['name'] for item in row[column])
+            if column in ('tags', 'ingredients') else row[column]
+            for column in CSV_COLUMNS
+        ])
+
+
+FORMATS = {
+    'ndjson': (ndjson_lines, 'application/x-ndjson'),
+    'csv': (csv_lines, 'text/csv'),
+}
@@ -0,0 +1,154 @@
+""" background processing of uploaded recipe images """
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from core.models import Recipe
+from recipe.cache import bump_user_version
+
+logger = logging.getLogger(__name__)
+
+# name: (bounding box, Pillow format, file extension, save options)
+RENDITIONS = {
+    'thumbnail': ((150, 150), 'JPEG', 'jpg', {'quality': 80}),
+    'medium': ((800, 800), 'JPEG', 'jpg', {'quality': 85}),
+    'webp': ((800, 800), 'WEBP', 'webp', {'quality': 80}),
+}
+
+RENDITIONS_DIR = os.path.join('uploads', 'recipe', 'renditions')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.RECIPE_IMAGE_WORKERS,
+                thread_name_prefix='recipe-images',
+            )
+        return _executor
+
+
+def schedule_renditions(recipe):
+    """Build the recipe's image renditions once the upload commits.
+
+    The work runs on a small thread pool so the request returns as soon
+    as the original is stored; RECIPE_IMAGE_WORKERS=0 runs it inline.
+    """
+    recipe_id, image_name = recipe.id, recipe.image.name
+
+    def submit():
+        if settings.RECIPE_IMAGE_WORKERS:
+            _get_executor().submit(_run, recipe_id, image_name)
+        else:
+            process_image(recipe_id, image_name)
+
+    transaction.on_commit(submit)
+
+
+def _run(recipe_id, image_name):
+    """Worker entry point: log failures and release the thread's connection"""
+    try:
+        process_image(recipe_id, image_name)
+    except Exception:
+        logger.exception('processing image of recipe %s failed', recipe_id)
+    finally:
+        close_old_connections()
+
+
+def render(source, size, image_format, options):
+    """Return the encoded bytes of one rendition of an open image.
+
+    The image is re-encoded without its EXIF block, after applying the
+    EXIF orientation so the result is the right way up.
+    """
+    image = ImageOps.exif_transpose(source)
+    if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+        image = image.convert('RGB')
+    image.thumbnail(size, Image.LANCZOS)
+    output = BytesIO()
+    image.save(output, format=image_format, optimize=True, **options)
+    return output.getvalue()
+
+
+def rendition_path(image_name, name):
+    """Storage path of one rendition of an image.
+
+    Image names are content hashes, so identical images share their
+    renditions as well.
+    """
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    ext = RENDITIONS[name][2]
+    return os.path.join(RENDITIONS_DIR, f'{stem}-{name}.{ext}')
+
+
+def process_image(recipe_id, image_name):
+    """Create every rendition of an uploaded image and record them.
+
+    Renditions already on disk, from another recipe with the same image,
+    are reused without decoding the image again. A rendition that can't
+    be built (e.g. Pillow without WebP support) is logged and left out,
+    and the others are still recorded. The paths are only
+    saved if the recipe still has the same image, so a slow job can't
+    overwrite the renditions of a newer upload.
+    """
+    recipe = Recipe.objects.filter(id=recipe_id, image=image_name).first()
+    if recipe is None:
+        return None
+
+    renditions = {
+        name: rendition_path(image_name, name) for name in RENDITIONS
+    }
+    missing = [
+        name for name, path in renditions.items()
+        if not default_storage.exists(path)
+    ]
+    if missing:
+        Image.init()
+        with recipe.image.storage.open(image_name) as image_file:
+            source = Image.open(image_file)
+            # let the JPEG decoder scale down while decoding, which is much
+            # cheaper than decoding a full size photo and resizing it
+            largest = max(size for size, *_ in RENDITIONS.values())
+            source.draft('RGB', largest)
+            source.load()
+            for name in missing:
+                size, image_format, ext, options = RENDITIONS[name]
+                if image_format not in Image.SAVE:
+                    logger.warning(
+                        'Pillow cannot write %s, skipping the %s rendition',
+                        image_format, name,
+                    )
+                    del renditions[name]
+                    continue
+                try:
+                    default_storage.save(renditions[name], ContentFile(
+                        render(source, size, image_format, options)
+                    ))
+                except Exception:
+                    logger.exception(
+                        'building the %s rendition of %s failed',
+                        name, image_name,
+                    )
+                    del renditions[name]
+
+    updated = Recipe.objects.filter(id=recipe_id, image=image_name).update(
+        image_renditions=renditions, updated_at=timezone.now(),
+    )
+    if not updated:
+        # the image was replaced meanwhile; gc_media collects the files
+        return None
+    bump_user_version(recipe.user_id)
+    return renditions
@@ -0,0 +1,38 @@
+""" pagination classes for the recipe api """
+from rest_framework.pagination import CursorPagination
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Opt-in keyset pagination for recipes.
+
+    Pages are fetched with a `WHERE id < cursor` seek on the newest-first
+    ordering, so the cost of a page does not depend on how deep it is.
+    Requests without a `cursor` or `page_size` parameter get the full,
+    unpaginated list.
+    """
+    ordering = '-id'
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Paginate only when the client asks for it"""
+        params = request.query_params
+        if (
+            self.cursor_query_param not in params
+            and self.page_size_query_param not in params
+        ):
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response_schema(self, schema):
+        """Document both shapes, as pages are only sent on request.
+
+        `schema` is the array of results the unpaginated list returns.
+        """
+        return {
+            'oneOf': [
+                schema,
+                super().get_paginated_response_schema(schema),
+            ],
+        }
@@ -1,22 +1,62 @@
 """" serializers for recipe api """
+from django.db import transaction
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
+from core.instrumentation import TimedSerializerMixin
 from core.models import Ingredient, Recipe, Tag
+from recipe.bulk import add_related, resolve_names, sync_related
 
-class TagSerializer(serializers.ModelSerializer):
+
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for tag object """
     class Meta:
         model = Tag
         fields = ['id','name']
         read_only_fields = ['id']
 
-class IngredientSerializer(serializers.ModelSerializer):
+
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for ingredient object """
     class Meta:
         model = Ingredient
         fields = ['id','name']
         read_only_fields = ['id']
 
-class RecipeSerializer(serializers.ModelSerializer):
+
+class TagCountSerializer(TagSerializer):
+    """Serializer for tag object with the number of recipes using it"""
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ['recipe_count']
+
+
+class IngredientCountSerializer(IngredientSerializer):
+    """Serializer for ingredient object with the number of recipes using it"""
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    class Meta(IngredientSerializer.Meta):
+        fields = IngredientSerializer.Meta.fields + ['recipe_count']
+
+
+class SparseFieldsMixin:
+    """Drop the fields not named in the `fields` serializer context.
+
+    The recipe views put the fields picked with `?fields=` / `?omit=` in
+    the context, so unused fields are never serialized.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get('fields')
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class RecipeSerializer(
+    TimedSerializerMixin, SparseFieldsMixin, serializers.ModelSerializer
+):
     """Serializer for recipe object """
     tags = TagSerializer(many=True, required=False)
     ingredients = IngredientSerializer(many=True, required=False)
@@ -28,50 +68,52 @@ class RecipeSerializer(serializers.ModelSerializer):
             'link','price','tags','ingredients']
         read_only_fields = ['id']
 
-    def _get_or_create_tags(self,tags,recipe):
+    def _get_or_create_tags(self, tags):
         """Helper function to get or create tags"""
         auth_user = self.context['request'].user
-        for tag in tags:
-            tag_obj, created = Tag.objects.get_or_create(
-                user=auth_user,
-                **tag
-            )
-            recipe.tags.add(tag_obj)
+        return resolve_names(
+            Tag, auth_user, [tag['name'] for tag in tags]
+        ).values()
 
-    def _get_or_create_ingredients(self,ingredients,recipe):
-        """Helper function to get or create tags"""
+    def _get_or_create_ingredients(self, ingredients):
+        """Helper function to get or create ingredients"""
         auth_user = self.context['request'].user
-        for ingredient in ingredients:
-            ingredient_obj, created = Ingredient.objects.get_or_create(
-                user=auth_user,
-                **ingredient
-            )
-            recipe.ingredients.add(ingredient_obj)
-
+        return resolve_names(
+            Ingredient,
+            auth_user,
+            [ingredient['name'] for ingredient in ingredients]
+        ).values()
 
+    @transaction.atomic
     def create(self, validated_data):
         """Create a new recipe """
         tags = validated_data.pop('tags', [])
         ingredients = validated_data.pop('ingredients', [])
         recipe = Recipe.objects.create(**validated_data)
-        self._get_or_create_tags(tags, recipe)
-        self._get_or_create_ingredients(ingredients, recipe)
+        add_related('tags', [(recipe, self._get_or_create_tags(tags))])
+        add_related(
+            'ingredients',
+            [(recipe, self._get_or_create_ingredients(ingredients))]
+        )
 
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         """Update a recipe """
         tags = validated_data.pop('tags', None)
         ingredients = validated_data.pop('ingredients', None)
 
         if tags is not None:
-            instance.tags.clear()
-            self._get_or_create_tags(tags,instance)
+            sync_related(
+                'tags', [(instance, self._get_or_create_tags(tags))]
+            )
 
         if ingredients is not None:
-            instance.ingredients.clear()
-            self._get_or_create_ingredients(ingredients,instance)
-
+            sync_related(
+                'ingredients',
+                [(instance, self._get_or_create_ingredients(ingredients))]
+            )
 
         for attr, value in validated_data.items():
             setattr(instance, attr, value)
@@ -82,14 +124,63 @@ class RecipeSerializer(serializers.ModelSerializer):
 
 class RecipeDetailSerializer(RecipeSerializer):
     """Serializer for recipe object detail view """
+    image_renditions = serializers.SerializerMethodField()
+
+    class Meta(RecipeSerializer.Meta):
+        fields = RecipeSerializer.Meta.fields + [
+            'description', 'image', 'image_renditions',
+        ]
+
+    @extend_schema_field({
+        'type': 'object',
+        'nullable': True,
+        'additionalProperties': {'type': 'string', 'format': 'uri'},
+    })
+    def get_image_renditions(self, recipe):
+        """Rendition urls by name, or null until the image is processed"""
+        if not recipe.image_renditions:
+            return None
+        storage = recipe.image.storage
+        request = self.context.get('request')
+        urls = {}
+        for name, path in recipe.image_renditions.items():
+            url = storage.url(path)
+            urls[name] = request.build_absolute_uri(url) if request else url
+        return urls
+
+
+class RecipeExportSerializer(RecipeSerializer):
+    """Serializer for one recipe of an export"""
 
     class Meta(RecipeSerializer.Meta):
-        fields = RecipeSerializer.Meta.fields + ['description','image']
+        fields = RecipeSerializer.Meta.fields + ['description']
 
-class RecipeImageSerializer(serializers.ModelSerializer):
+
+class RecipeImageSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """serializers for uploading image to recipes"""
     class Meta:
         model = Recipe
         fields = ['id','image']
         read_only_fields = ['id']
         extra_kwargs = {'image': {'required':'True'}}
+
+
+class RecipeBulkUpdateSerializer(RecipeSerializer):
+    """Serializer for one item of a bulk recipe update"""
+    id = serializers.IntegerField()
+
+    def validate(self, attrs):
+        """Require the id of the recipe being updated"""
+        if 'id' not in attrs:
+            raise serializers.ValidationError(
+                {'id': ['This field is required.']}
+            )
+        return attrs
+
+
+class RecipeBulkDeleteSerializer(serializers.Serializer):
+    """Serializer for the ids of a bulk recipe delete"""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+    )
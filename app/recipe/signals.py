@@ -0,0 +1,78 @@
+""" signal handlers keeping recipe timestamps and api caches fresh """
+from django.conf import settings
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.models import Ingredient, Recipe, Tag
+from recipe.cache import bump_user_version
+
+RECIPE_FIELDS = {
+    Recipe.tags.through: 'tags',
+    Recipe.ingredients.through: 'ingredients',
+}
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def invalidate_owner(sender, instance, **kwargs):
+    """Invalidate the owner's cached lists when one of their items changes"""
+    bump_user_version(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def recipe_links_changed(sender, instance, action, reverse, pk_set,
+                         bulk=False, **kwargs):
+    """Touch recipes and invalidate caches when recipe links change.
+
+    Senders passing `bulk=True` (see recipe.bulk) handle both themselves
+    once for the whole batch.
+    """
+    if bulk:
+        return
+    if reverse and action == 'pre_clear':
+        # the cleared recipes are only known before the rows go
+        recipes = Recipe.objects.filter(**{RECIPE_FIELDS[sender]: instance})
+    elif reverse and action in ('post_add', 'post_remove'):
+        recipes = Recipe.objects.filter(pk__in=pk_set)
+    elif not reverse and action.startswith('post_'):
+        recipes = Recipe.objects.filter(pk=instance.pk)
+    else:
+        return
+    recipes.update(updated_at=timezone.now())
+    bump_user_version(instance.user_id)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(pre_delete, sender=Tag)
+def tag_changed(sender, instance, created=False, **kwargs):
+    """Touch the recipes showing a renamed or deleted tag"""
+    if not created:
+        Recipe.objects.filter(tags=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(pre_delete, sender=Ingredient)
+def ingredient_changed(sender, instance, created=False, **kwargs):
+    """Touch the recipes showing a renamed or deleted ingredient"""
+    if not created:
+        Recipe.objects.filter(
+            ingredients=instance
+        ).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def invalidate_new_user(sender, instance, created, **kwargs):
+    """Start new users on a fresh version, as user ids can be reused"""
+    if created:
+        bump_user_version(instance.pk)
@@ -0,0 +1,98 @@
+""" test tag and ingredient autocomplete """
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+
+
+class AutocompleteTests(TestCase):
+    """test prefix suggestions ordered by usage"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'password123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def suggest(self, basename, **params):
+        res = self.client.get(
+            reverse(f'recipe:{basename}-autocomplete'), params
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_prefix_ordered_by_usage(self):
+        """test case-insensitive prefix matches, most used first"""
+        for field, model, basename in (
+            ('tags', Tag, 'tag'),
+            ('ingredients', Ingredient, 'ingredient'),
+        ):
+            names = ['Salt', 'salsa', 'Sage', 'Pepper', '50%_off']
+            items = {
+                name: model.objects.create(user=self.user, name=name)
+                for name in names
+            }
+            for i in range(2):
+                recipe = Recipe.objects.create(
+                    user=self.user, title=f'r{i}', time_minutes=1,
+                    price=Decimal('1.00'),
+                )
+                getattr(recipe, field).add(items['salsa'])
+            getattr(recipe, field).add(items['Sage'])
+
+            data = self.suggest(basename, q='SA')
+
+            self.assertEqual(
+                [(item['name'], item['recipe_count']) for item in data],
+                [('salsa', 2), ('Sage', 1), ('Salt', 0)],
+            )
+            # LIKE wildcards in the prefix are matched literally
+            self.assertEqual(
+                [item['name'] for item in self.suggest(basename, q='50%')],
+                ['50%_off'],
+            )
+
+    def test_limit(self):
+        """test the limit is applied and clamped"""
+        for i in range(60):
+            Tag.objects.create(user=self.user, name=f'tag {i:02}')
+
+        self.assertEqual(len(self.suggest('tag', q='tag', limit=3)), 3)
+        self.assertEqual(len(self.suggest('tag', q='tag')), 10)
+        self.assertEqual(len(self.suggest('tag', q='tag', limit=500)), 50)
+        res = self.client.get(
+            reverse('recipe:tag-autocomplete'), {'limit': 'x'}
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_only_own_items(self):
+        """test other users' items are never suggested"""
+        other = get_user_model().objects.create_user('other@example.com')
+        Tag.objects.create(user=other, name='Secret')
+        Tag.objects.create(user=self.user, name='Soup')
+
+        data = self.suggest('tag', q='s')
+
+        self.assertEqual([item['name'] for item in data], ['Soup'])
+
+    def test_schema_lists_own_serializer(self):
+        """test each view set documents a list of its own items"""
+        res = self.client.get(reverse('api-schema'), {'format': 'json'})
+        paths = res.json()['paths']
+
+        for basename, component in (
+            ('tags', 'TagCount'),
+            ('ingredients', 'IngredientCount'),
+        ):
+            schema = paths[f'/api/recipe/{basename}/autocomplete/']['get'][
+                'responses']['200']['content']['application/json']['schema']
+            self.assertEqual(schema['type'], 'array')
+            self.assertEqual(
+                schema['items']['$ref'], f'#/components/schemas/{component}'
+            )
@@ -0,0 +1,162 @@
+""" test the per-user list response cache """
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+
+RECIPE_URL = reverse('recipe:recipe-list')
+TAGS_URL = reverse('recipe:tag-list')
+INGREDIENTS_URL = reverse('recipe:ingredient-list')
+
+
+def create_recipe(user, **params):
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.99'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class ListCacheTests(TestCase):
+    """test list responses are cached per user until their data changes"""
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'password123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def assertCached(self, url, params=None):
+        """assert the request is answered without touching the database"""
+        with self.assertNumQueries(0):
+            return self.client.get(url, params)
+
+    def test_repeated_list_is_cached(self):
+        """test the second identical request is served from the cache"""
+        create_recipe(self.user)
+        for url in (RECIPE_URL, TAGS_URL, INGREDIENTS_URL):
+            first = self.client.get(url)
+            second = self.assertCached(url)
+            self.assertEqual(first.data, second.data)
+
+    def test_query_params_are_cached_separately(self):
+        """test different filters get different cache entries"""
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        create_recipe(self.user).tags.add(tag)
+        create_recipe(self.user)
+
+        all_recipes = self.client.get(RECIPE_URL)
+        filtered = self.client.get(RECIPE_URL, {'tags': str(tag.id)})
+
+        self.assertEqual(len(all_recipes.data), 2)
+        self.assertEqual(len(filtered.data), 1)
+        self.assertEqual(
+            len(self.assertCached(RECIPE_URL, {'tags': str(tag.id)}).data), 1
+        )
+
+    def test_cache_is_per_user(self):
+        """test users never see each other's cached lists"""
+        create_recipe(self.user)
+        self.client.get(RECIPE_URL)
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'password123'
+        )
+        client = APIClient()
+        client.force_authenticate(other)
+
+        res = client.get(RECIPE_URL)
+
+        self.assertEqual(res.data, [])
+
+    def test_recipe_write_invalidates(self):
+        """test creating, updating and deleting recipes invalidates"""
+        self.client.get(RECIPE_URL)
+        recipe = create_recipe(self.user, title='Soup')
+        self.assertEqual(self.client.get(RECIPE_URL).data[0]['title'], 'Soup')
+
+        recipe.title = 'Stew'
+        recipe.save()
+        self.assertEqual(self.client.get(RECIPE_URL).data[0]['title'], 'Stew')
+
+        recipe.delete()
+        self.assertEqual(self.client.get(RECIPE_URL).data, [])
+
+    def test_m2m_change_invalidates(self):
+        """test linking tags to a recipe invalidates recipe and tag lists"""
+        recipe = create_recipe(self.user)
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        self.client.get(RECIPE_URL)
+        self.client.get(TAGS_URL, {'assigned_only': 1})
+
+        recipe.tags.add(tag)
+
+        self.assertEqual(len(self.client.get(RECIPE_URL).data[0]['tags']), 1)
+        self.assertEqual(
+            len(self.client.get(TAGS_URL, {'assigned_only': 1}).data), 1
+        )
+
+    def test_tag_rename_invalidates_recipes(self):
+        """test renaming a tag refreshes the recipes showing it"""
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        create_recipe(self.user).tags.add(tag)
+        self.client.get(RECIPE_URL)
+
+        self.client.patch(
+            reverse('recipe:tag-detail', args=[tag.id]), {'name': 'Supper'}
+        )
+
+        res = self.client.get(RECIPE_URL)
+        self.assertEqual(res.data[0]['tags'][0]['name'], 'Supper')
+
+    def test_api_writes_invalidate(self):
+        """test writes through the api, including bulk ones, invalidate"""
+        self.client.get(RECIPE_URL)
+        self.client.get(INGREDIENTS_URL)
+        payload = {
+            'title': 'Curry',
+            'time_minutes': 30,
+            'price': '9.99',
+            'ingredients': [{'name': 'Rice'}],
+        }
+        self.client.post(RECIPE_URL, payload, format='json')
+        self.assertEqual(len(self.client.get(RECIPE_URL).data), 1)
+        self.assertEqual(len(self.client.get(INGREDIENTS_URL).data), 1)
+
+        payload['ingredients'] = [{'name': 'Lentils'}]
+        self.client.post(
+            reverse('recipe:recipe-bulk'), [payload], format='json'
+        )
+        self.assertEqual(len(self.client.get(RECIPE_URL).data), 2)
+        self.assertEqual(len(self.client.get(INGREDIENTS_URL).data), 2)
+
+        recipe_id = self.client.get(RECIPE_URL).data[0]['id']
+        self.client.patch(
+            reverse('recipe:recipe-bulk'),
+            [{'id': recipe_id, 'title': 'Dal'}],
+            format='json',
+        )
+        self.assertEqual(self.client.get(RECIPE_URL).data[0]['title'], 'Dal')
+
+    def test_ingredient_delete_invalidates(self):
+        """test deleting an ingredient refreshes the ingredient list"""
+        ingredient = Ingredient.objects.create(user=self.user, name='Salt')
+        self.assertEqual(len(self.client.get(INGREDIENTS_URL).data), 1)
+
+        ingredient.delete()
+
+        self.assertEqual(self.client.get(INGREDIENTS_URL).data, [])
+
+    @override_settings(RECIPE_LIST_CACHE_TIMEOUT=0)
+    def test_cache_disabled(self):
+        """test a zero timeout turns the cache off"""
+        create_recipe(self.user)
+        self.client.get(RECIPE_URL)
+        # freshness check, recipes, tags and ingredients prefetch
+        with self.assertNumQueries(4):
+            self.client.get(RECIPE_URL)
@@ -0,0 +1,224 @@
+""" test conditional GETs on the recipe endpoints """
+from datetime import timedelta
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe, Tag
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def create_recipe(user, **params):
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.99'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+@override_settings(RECIPE_LIST_CACHE_TIMEOUT=0)
+class ConditionalGetTests(TestCase):
+    """test ETag and Last-Modified handling"""
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'password123'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(self.user)
+
+    def assertNotModified(self, url, **headers):
+        """assert a single freshness query answers the request with a 304"""
+        with self.assertNumQueries(1):
+            res = self.client.get(url, **headers)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b'')
+
+    def test_list_validators(self):
+        """test the list sends validators and honours If-None-Match"""
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('Last-Modified', res)
+        self.assertNotModified(RECIPE_URL, HTTP_IF_NONE_MATCH=res['ETag'])
+
+    def test_detail_validators(self):
+        """test the detail route honours If-None-Match"""
+        url = detail_url(self.recipe.id)
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn('Last-Modified', res)
+        self.assertNotModified(url, HTTP_IF_NONE_MATCH=res['ETag'])
+
+    def test_if_modified_since(self):
+        """test If-Modified-Since compares against updated_at"""
+        url = detail_url(self.recipe.id)
+        later = (timezone.now() + timedelta(minutes=1)).timestamp()
+        earlier = (timezone.now() - timedelta(minutes=1)).timestamp()
+
+        self.assertNotModified(url, HTTP_IF_MODIFIED_SINCE=http_date(later))
+        res = self.client.get(url, HTTP_IF_MODIFIED_SINCE=http_date(earlier))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_etag_depends_on_query_params(self):
+        """test filtered lists get their own ETag"""
+        res = self.client.get(RECIPE_URL)
+        filtered = self.client.get(
+            RECIPE_URL, {'search': 'x'}, HTTP_IF_NONE_MATCH=res['ETag']
+        )
+        self.assertEqual(filtered.status_code, status.HTTP_200_OK)
+
+    def test_etag_depends_on_format(self):
+        """test JSON and MessagePack bodies get their own ETag"""
+        res = self.client.get(RECIPE_URL)
+        packed = self.client.get(
+            RECIPE_URL,
+            HTTP_ACCEPT='application/msgpack',
+            HTTP_IF_NONE_MATCH=res['ETag'],
+        )
+        self.assertEqual(packed.status_code, status.HTTP_200_OK)
+        self.assertIn('Accept', res['Vary'])
+
+    def test_changes_update_etag(self):
+        """test recipe, link and tag changes all refresh the ETag"""
+        url = detail_url(self.recipe.id)
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+
+        def change_recipe():
+            self.recipe.title = 'New title'
+            self.recipe.save()
+
+        def rename_tag():
+            tag.name = 'Supper'
+            tag.save()
+
+        for change in (
+            change_recipe,
+            lambda: self.recipe.tags.add(tag),
+            rename_tag,
+            lambda: tag.recipe_set.clear(),
+        ):
+            list_etag = self.client.get(RECIPE_URL)['ETag']
+            detail_etag = self.client.get(url)['ETag']
+            change()
+            res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=list_etag)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=detail_etag)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_delete_updates_list_etag(self):
+        """test deleting a recipe refreshes the list ETag"""
+        create_recipe(self.user)
+        etag = self.client.get(RECIPE_URL)['ETag']
+
+        self.recipe.delete()
+
+        res = self.client.get(RECIPE_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+
+    def test_delete_not_hidden_by_if_modified_since(self):
+        """test a list losing a recipe isn't answered with a stale 304"""
+        create_recipe(self.user)
+        later = (timezone.now() + timedelta(minutes=1)).timestamp()
+
+        self.recipe.delete()
+
+        res = self.client.get(
+            RECIPE_URL, HTTP_IF_MODIFIED_SINCE=http_date(later)
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
+
+    def test_api_updates_touch_recipe(self):
+        """test single and bulk api updates bump updated_at"""
+        before = self.recipe.updated_at
+        self.client.patch(
+            detail_url(self.recipe.id),
+            {'tags': [{'name': 'Lunch'}]},
+            format='json',
+        )
+        self.recipe.refresh_from_db()
+        self.assertGreater(self.recipe.updated_at, before)
+
+        before = self.recipe.updated_at
+        self.client.patch(
+            reverse('recipe:recipe-bulk'),
+            [{'id': self.recipe.id, 'time_minutes': 20}],
+            format='json',
+        )
+        self.recipe.refresh_from_db()
+        self.assertGreater(self.recipe.updated_at, before)
+
+        before = self.recipe.updated_at
+        self.client.patch(
+            reverse('recipe:recipe-bulk'),
+            [{'id': self.recipe.id, 'ingredients': [{'name': 'Salt'}]}],
+            format='json',
+        )
+        self.recipe.refresh_from_db()
+        self.assertGreater(self.recipe.updated_at, before)
+
+    def test_missing_recipe(self):
+        """test conditional handling leaves 404s alone"""
+        res = self.client.get(detail_url(self.recipe.id + 100))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_malformed_pk(self):
+        """test a pk that isn't a number is a 404, not a server error"""
+        res = self.client.get(detail_url('abc'))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CachedConditionalGetTests(TestCase):
+    """test cached lists answer conditional requests"""
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'password123'
+        )
+        self.client.force_authenticate(self.user)
+        create_recipe(self.user)
+
+    def test_cached_list_not_modified(self):
+        """test a cached list answers If-None-Match without queries"""
+        res = self.client.get(RECIPE_URL)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(RECIPE_URL)
+            not_modified = self.client.get(
+                RECIPE_URL, HTTP_IF_NONE_MATCH=res['ETag']
+            )
+
+        self.assertEqual(cached['ETag'], res['ETag'])
+        self.assertEqual(
+            not_modified.status_code, status.HTTP_304_NOT_MODIFIED
+        )
+
+    def test_cached_list_ignores_if_modified_since(self):
+        """test a cached list isn't answered from a date after a delete"""
+        recipe = create_recipe(self.user)
+        later = (timezone.now() + timedelta(minutes=1)).timestamp()
+        self.client.get(RECIPE_URL)
+
+        recipe.delete()
+
+        res = self.client.get(
+            RECIPE_URL, HTTP_IF_MODIFIED_SINCE=http_date(later)
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 1)
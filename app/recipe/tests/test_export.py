@@ -0,0 +1,117 @@
+""" test streaming recipe exports """
+import csv
+from decimal import Decimal
+from io import StringIO
+import json
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+
+EXPORT_URL = reverse('recipe:recipe-export')
+
+
+def create_recipe(user, **params):
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.99'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+class RecipeExportTests(TestCase):
+    """test exporting recipes as NDJSON and CSV"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'password123'
+        )
+        self.client.force_authenticate(self.user)
+        self.tag = Tag.objects.create(user=self.user, name='Dinner')
+        self.salt = Ingredient.objects.create(user=self.user, name='Salt')
+        self.pepper = Ingredient.objects.create(user=self.user, name='Pepper')
+
+    def export(self, params=None):
+        res = self.client.get(EXPORT_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.streaming)
+        return res, b''.join(res.streaming_content).decode()
+
+    def test_export_ndjson(self):
+        """test one JSON object per line with tags and ingredients"""
+        recipe = create_recipe(self.user, description='Hot, "spicy"')
+        recipe.tags.add(self.tag)
+        recipe.ingredients.add(self.salt, self.pepper)
+        create_recipe(get_user_model().objects.create_user('o@example.com'))
+
+        res, body = self.export()
+
+        self.assertEqual(res['Content-Type'], 'application/x-ndjson')
+        lines = body.splitlines()
+        self.assertEqual(len(lines), 1)
+        row = json.loads(lines[0])
+        self.assertEqual(row['id'], recipe.id)
+        self.assertEqual(row['price'], '5.99')
+        self.assertEqual(row['description'], 'Hot, "spicy"')
+        self.assertEqual(row['tags'], [{'id': self.tag.id, 'name': 'Dinner'}])
+        self.assertEqual(
+            sorted(item['name'] for item in row['ingredients']),
+            ['Pepper', 'Salt'],
+        )
+
+    def test_export_csv(self):
+        """test a header row and names joined in one cell"""
+        recipe = create_recipe(self.user, description='Hot, "spicy"')
+        recipe.ingredients.add(self.salt, self.pepper)
+
+        res, body = self.export({'export_format': 'csv'})
+
+        self.assertEqual(res['Content-Type'], 'text/csv')
+        self.assertIn('recipes.csv', res['Content-Disposition'])
+        rows = list(csv.DictReader(StringIO(body)))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['description'], 'Hot, "spicy"')
+        self.assertEqual(rows[0]['tags'], '')
+        self.assertEqual(
+            sorted(rows[0]['ingredients'].split('; ')), ['Pepper', 'Salt']
+        )
+
+    def test_export_applies_filters(self):
+        """test the list filters narrow the export"""
+        tagged = create_recipe(self.user)
+        tagged.tags.add(self.tag)
+        create_recipe(self.user)
+
+        res, body = self.export({'tags': str(self.tag.id)})
+
+        self.assertEqual(
+            [json.loads(line)['id'] for line in body.splitlines()],
+            [tagged.id],
+        )
+
+    def test_export_prefetches_per_chunk(self):
+        """test each chunk costs two prefetch queries and nothing more"""
+        for i in range(5):
+            create_recipe(self.user).tags.add(self.tag)
+
+        with patch('recipe.views.RecipeViewSet.export_chunk_size', 2):
+            res = self.client.get(EXPORT_URL)
+            # one cursor query plus tags and ingredients for 3 chunks
+            with self.assertNumQueries(7):
+                body = b''.join(res.streaming_content)
+
+        self.assertEqual(len(body.splitlines()), 5)
+
+    def test_export_invalid_format(self):
+        """test unknown formats are rejected"""
+        res = self.client.get(EXPORT_URL, {'export_format': 'xml'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,196 @@
+""" test background processing of recipe images """
+from decimal import Decimal
+from io import BytesIO, StringIO
+import os
+import shutil
+import tempfile
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Recipe
+from recipe.images import process_image, render
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+def upload_url(recipe_id):
+    return reverse('recipe:recipe-upload-image', args=[recipe_id])
+
+
+def detail_url(recipe_id):
+    return reverse('recipe:recipe-detail', args=[recipe_id])
+
+
+def photo(size=(1600, 1200)):
+    """a JPEG carrying an orientation and a camera EXIF tag"""
+    exif = Image.Exif()
+    exif[0x0112] = 6  # rotated 90 degrees
+    exif[0x010F] = 'Phone maker'
+    output = BytesIO()
+    Image.new('RGB', size, 'red').save(
+        output, format='JPEG', exif=exif.tobytes()
+    )
+    output.name = 'photo.jpg'
+    output.seek(0)
+    return output
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, RECIPE_IMAGE_WORKERS=0)
+class RecipeImageProcessingTests(TestCase):
+    """test renditions are built after an upload commits"""
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'password123'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = Recipe.objects.create(
+            user=self.user, title='Soup', time_minutes=5,
+            price=Decimal('1.00'),
+        )
+
+    def upload(self, image=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(
+                upload_url(self.recipe.id), {'image': image or photo()},
+                format='multipart',
+            )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+
+    def test_renditions_created(self):
+        """test resized, EXIF free renditions are recorded and exposed"""
+        self.upload()
+
+        renditions = self.recipe.image_renditions
+        self.assertEqual(
+            set(renditions), {'thumbnail', 'medium', 'webp'}
+        )
+        for name, bound, image_format in (
+            ('thumbnail', 150, 'JPEG'),
+            ('medium', 800, 'JPEG'),
+            ('webp', 800, 'WEBP'),
+        ):
+            with Image.open(os.path.join(MEDIA_ROOT, renditions[name])) as img:
+                # the orientation tag was applied, so portrait now
+                self.assertEqual(img.height, bound)
+                self.assertLess(img.width, img.height)
+                self.assertEqual(img.format, image_format)
+                self.assertEqual(dict(img.getexif()), {})
+
+        res = self.client.get(detail_url(self.recipe.id))
+        urls = res.data['image_renditions']
+        self.assertTrue(urls['thumbnail'].startswith('http://testserver/'))
+        self.assertTrue(urls['webp'].endswith('.webp'))
+
+    def test_failed_rendition_skipped(self):
+        """test one rendition failing doesn't stop the others"""
+        def render_jpeg(source, size, image_format, options):
+            if image_format == 'WEBP':
+                raise OSError('encoder webp not available')
+            return render(source, size, image_format, options)
+
+        with patch('recipe.images.render', side_effect=render_jpeg), \
+                self.assertLogs('recipe.images', 'ERROR'):
+            # a size of its own, so no renditions exist on disk yet
+            self.upload(photo(size=(1000, 700)))
+
+        self.assertEqual(
+            set(self.recipe.image_renditions), {'thumbnail', 'medium'}
+        )
+
+    def test_unsupported_format_skipped(self):
+        """test formats Pillow can't write are left out"""
+        save = {k: v for k, v in Image.SAVE.items() if k != 'WEBP'}
+        with patch.dict(Image.SAVE, save, clear=True), \
+                self.assertLogs('recipe.images', 'WARNING'):
+            self.upload(photo(size=(1000, 600)))
+
+        self.assertEqual(
+            set(self.recipe.image_renditions), {'thumbnail', 'medium'}
+        )
+
+    def test_renditions_null_until_ready(self):
+        """test the detail view shows null before processing finishes"""
+        with self.captureOnCommitCallbacks(execute=False):
+            self.client.post(
+                upload_url(self.recipe.id), {'image': photo()},
+                format='multipart',
+            )
+
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertIsNone(res.data['image_renditions'])
+        self.assertIsNotNone(res.data['image'])
+
+    def test_new_upload_clears_renditions(self):
+        """test replacing the image drops the old renditions"""
+        self.upload()
+        old_image = self.recipe.image.name
+
+        with self.captureOnCommitCallbacks(execute=False):
+            self.client.post(
+                upload_url(self.recipe.id), {'image': photo((800, 600))},
+                format='multipart',
+            )
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_renditions, {})
+
+        # a late job for the old image must not record its renditions
+        self.assertIsNone(process_image(self.recipe.id, old_image))
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.image_renditions, {})
+
+    @override_settings(RECIPE_IMAGE_WORKERS=2)
+    def test_processing_runs_in_worker_pool(self):
+        """test the request only hands the job to the pool"""
+        with patch('recipe.images._get_executor') as get_executor:
+            self.upload()
+
+        get_executor.return_value.submit.assert_called_once()
+        self.assertEqual(self.recipe.image_renditions, {})
+
+    def test_identical_images_shared_until_collected(self):
+        """test recipes with the same photo share files until both let go"""
+        other = Recipe.objects.create(
+            user=self.user, title='Stew', time_minutes=5,
+            price=Decimal('1.00'),
+        )
+        self.upload()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(
+                upload_url(other.id), {'image': photo()}, format='multipart',
+            )
+        other.refresh_from_db()
+        self.assertEqual(other.image.name, self.recipe.image.name)
+        self.assertEqual(other.image_renditions, self.recipe.image_renditions)
+
+        paths = [self.recipe.image.name]
+        paths += self.recipe.image_renditions.values()
+        other.delete()
+        call_command('gc_media', min_age=0, stdout=StringIO())
+        for path in paths:
+            self.assertTrue(os.path.exists(os.path.join(MEDIA_ROOT, path)))
+
+        # requests never delete files, so an upload reusing a file can't
+        # lose it to a concurrent delete; gc_media collects them later
+        self.upload(photo((800, 600)))
+        for path in paths:
+            self.assertTrue(os.path.exists(os.path.join(MEDIA_ROOT, path)))
+        call_command('gc_media', min_age=0, stdout=StringIO())
+        for path in paths:
+            self.assertFalse(os.path.exists(os.path.join(MEDIA_ROOT, path)))
+        self.assertTrue(os.path.exists(self.recipe.image.path))
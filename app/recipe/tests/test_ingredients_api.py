@@ -99,3 +99,21 @@ class PrivateIngredientsApiTests(TestCase):
         recipe2.ingredients.add(ingredient)
         res = self.client.get(INGREDIENTS_URL,{'assigned_only':1})
         self.assertEqual(len(res.data),1)
+
+    def test_ingredients_with_recipe_count(self):
+        """test ingredients can include the number of recipes using them"""
+        salt = Ingredient.objects.create(user=self.user, name='Salt')
+        Ingredient.objects.create(user=self.user, name='Pepper')
+        recipe = Recipe.objects.create(
+            title='Recipe 1', time_minutes=10, user=self.user,
+            price=Decimal('4.8'),
+        )
+        recipe.ingredients.add(salt)
+
+        res = self.client.get(
+            INGREDIENTS_URL, {'recipe_count': 1, 'assigned_only': 1}
+        )
+
+        self.assertEqual(
+            res.data, [{'id': salt.id, 'name': 'Salt', 'recipe_count': 1}]
+        )
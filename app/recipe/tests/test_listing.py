@@ -0,0 +1,87 @@
+""" test the values based recipe list matches the serializer """
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+from recipe.serializers import RecipeSerializer
+
+RECIPE_URL = reverse('recipe:recipe-list')
+
+
+class ValuesListParityTests(TestCase):
+    """test list responses are byte-identical to RecipeSerializer output"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'password123'
+        )
+        self.client.force_authenticate(self.user)
+        tags = [
+            Tag.objects.create(user=self.user, name=name)
+            for name in ('Vegan', 'Déjeuner', 'Quick "one"')
+        ]
+        ingredients = [
+            Ingredient.objects.create(user=self.user, name=name)
+            for name in ('Salt', 'Pepper', '唐辛子')
+        ]
+        prices = [Decimal('5'), Decimal('5.5'), Decimal('0.99'), Decimal('12')]
+        for i, price in enumerate(prices):
+            recipe = Recipe.objects.create(
+                user=self.user,
+                title=f'Recipe {i} ☕',
+                time_minutes=i * 7,
+                price=price,
+                link='' if i % 2 else f'https://example.com/{i}',
+            )
+            recipe.tags.add(*tags[:i])
+            recipe.ingredients.add(*ingredients[i % 3:])
+        Recipe.objects.create(
+            user=get_user_model().objects.create_user('other@example.com'),
+            title='Not mine', time_minutes=1, price=Decimal('1.00'),
+        )
+
+    def serialized(self, queryset, fields=None):
+        """Render recipes the way RecipeSerializer does"""
+        context = {} if fields is None else {'fields': fields}
+        data = RecipeSerializer(
+            queryset.prefetch_related('tags', 'ingredients'),
+            many=True, context=context,
+        ).data
+        return JSONRenderer().render(data)
+
+    def test_list_matches_serializer(self):
+        """test the full list renders the same bytes"""
+        res = self.client.get(RECIPE_URL)
+
+        expected = self.serialized(
+            Recipe.objects.filter(user=self.user).order_by('-id')
+        )
+        self.assertEqual(res.content, expected)
+
+    def test_sparse_list_matches_serializer(self):
+        """test a list with picked fields renders the same bytes"""
+        res = self.client.get(RECIPE_URL, {'fields': 'price,tags,id'})
+
+        expected = self.serialized(
+            Recipe.objects.filter(user=self.user).order_by('-id'),
+            fields=['id', 'price', 'tags'],
+        )
+        self.assertEqual(res.content, expected)
+
+    def test_page_matches_serializer(self):
+        """test a cursor page lists the same recipes and bytes"""
+        res = self.client.get(RECIPE_URL, {'page_size': 2})
+        res = self.client.get(res.data['next'])
+
+        expected = self.serialized(
+            Recipe.objects.filter(user=self.user).order_by('-id')[2:4]
+        )
+        self.assertEqual(
+            JSONRenderer().render(res.data['results']), expected
+        )
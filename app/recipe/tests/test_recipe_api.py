@@ -5,6 +5,9 @@ from rest_framework.test import APIClient
 from django.contrib.auth import get_user_model
 from core.models import Recipe,Tag,Ingredient
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.db.models.signals import m2m_changed
 from decimal import Decimal
 from recipe.serializers import (
     RecipeSerializer,
@@ -12,6 +15,7 @@ from recipe.serializers import (
 )
 import tempfile
 import os
+import unittest
 
 from PIL import Image
 
@@ -396,6 +400,63 @@ class PrivateRecipeAPITests(TestCase):
         self.assertIn(s2.data,res.data)
         self.assertNotIn(s3.data,res.data)
 
+    def test_filter_recipe_with_several_matching_tags_once(self):
+        """test a recipe matching several tags is returned once"""
+        r1 = create_recipe(user=self.user, title='bazin')
+        t1 = Tag.objects.create(user=self.user, name='tag1')
+        t2 = Tag.objects.create(user=self.user, name='tag2')
+        r1.tags.add(t1, t2)
+        params = {'tags': f'{t1.id},{t2.id}'}
+
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(RECIPE_URL, params)
+
+        self.assertEqual([r['id'] for r in res.data], [r1.id])
+        for query in ctx.captured_queries:
+            self.assertNotIn('DISTINCT', query['sql'])
+
+    def test_filter_recipe_by_all_tags(self):
+        """test match=all returns recipes having every listed tag"""
+        t1 = Tag.objects.create(user=self.user, name='tag1')
+        t2 = Tag.objects.create(user=self.user, name='tag2')
+        t3 = Tag.objects.create(user=self.user, name='tag3')
+        both = create_recipe(user=self.user, title='both')
+        both.tags.add(t1, t2)
+        all_three = create_recipe(user=self.user, title='all three')
+        all_three.tags.add(t1, t2, t3)
+        one = create_recipe(user=self.user, title='one')
+        one.tags.add(t1)
+        params = {'tags': f'{t1.id},{t2.id}', 'match': 'all'}
+
+        res = self.client.get(RECIPE_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [r['id'] for r in res.data], [all_three.id, both.id]
+        )
+
+    def test_filter_recipe_by_all_tags_and_ingredients(self):
+        """test match=all applies to tags and ingredients together"""
+        t1 = Tag.objects.create(user=self.user, name='tag1')
+        t2 = Tag.objects.create(user=self.user, name='tag2')
+        i1 = Ingredient.objects.create(user=self.user, name='Chili')
+        i2 = Ingredient.objects.create(user=self.user, name='Limes')
+        match = create_recipe(user=self.user, title='match')
+        match.tags.add(t1, t2)
+        match.ingredients.add(i1, i2)
+        partial = create_recipe(user=self.user, title='partial')
+        partial.tags.add(t1, t2)
+        partial.ingredients.add(i1)
+        params = {
+            'tags': f'{t1.id},{t2.id}',
+            'ingredients': f'{i1.id},{i2.id}',
+            'match': 'all',
+        }
+
+        res = self.client.get(RECIPE_URL, params)
+
+        self.assertEqual([r['id'] for r in res.data], [match.id])
+
 class Image_upload_tests(TestCase):
     """Tests for the image upload api"""
     def setUp(self):
@@ -427,3 +488,412 @@ class Image_upload_tests(TestCase):
         res = self.client.post(url,payload,format='multipart')
 
         self.assertEqual(res.status_code,status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeQueryCountTests(TestCase):
+    """test the recipe endpoints run a fixed number of queries"""
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='user@example.com', password='password123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def _create_recipes(self, count):
+        """create recipes each with a couple of tags and ingredients"""
+        for i in range(count):
+            recipe = create_recipe(user=self.user, title=f'recipe {i}')
+            for j in range(2):
+                recipe.tags.add(
+                    Tag.objects.create(
+                        user=self.user, name=f'tag {recipe.id}-{j}'
+                    )
+                )
+                recipe.ingredients.add(
+                    Ingredient.objects.create(
+                        user=self.user, name=f'ingredient {recipe.id}-{j}'
+                    )
+                )
+
+    def test_list_query_count_is_constant(self):
+        """test listing recipes does not run a query per recipe"""
+        for count in (1, 10):
+            self._create_recipes(count)
+            # freshness check, recipes, tags and ingredients prefetch
+            with self.assertNumQueries(4):
+                res = self.client.get(RECIPE_URL)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(len(res.data), 11)
+        self.assertEqual(len(res.data[0]['tags']), 2)
+        self.assertEqual(len(res.data[0]['ingredients']), 2)
+
+    def test_filtered_list_query_count_is_constant(self):
+        """test filtering recipes keeps the query count fixed"""
+        self._create_recipes(5)
+        tag_ids = ','.join(str(t.id) for t in Tag.objects.all())
+        ingredient_ids = ','.join(
+            str(i.id) for i in Ingredient.objects.all()
+        )
+        params = {'tags': tag_ids, 'ingredients': ingredient_ids}
+
+        with self.assertNumQueries(4):
+            res = self.client.get(RECIPE_URL, params)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 5)
+
+    def test_detail_query_count(self):
+        """test retrieving a recipe prefetches tags and ingredients"""
+        self._create_recipes(3)
+        recipe = Recipe.objects.filter(user=self.user).first()
+
+        with self.assertNumQueries(4):
+            res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['tags']), 2)
+
+    def _count_create_queries(self, size):
+        """return the queries run creating a recipe with `size` new items"""
+        payload = {
+            'title': 'Sample recipe',
+            'time_minutes': 10,
+            'price': Decimal('5.99'),
+            'tags': [{'name': f'tag {size}-{i}'} for i in range(size)],
+            'ingredients': [
+                {'name': f'ingredient {size}-{i}'} for i in range(size)
+            ],
+        }
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.post(RECIPE_URL, payload, format='json')
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data['ingredients']), size)
+        return len(ctx.captured_queries)
+
+    def test_create_query_count_is_constant(self):
+        """test creating a recipe does not run queries per tag/ingredient"""
+        self.assertEqual(
+            self._count_create_queries(2),
+            self._count_create_queries(25),
+        )
+
+
+class RecipePaginationTests(TestCase):
+    """test opt-in cursor pagination of the recipe list"""
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='user@example.com', password='password123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_list_unpaginated_by_default(self):
+        """test the list is a plain array without pagination params"""
+        create_recipe(user=self.user)
+        res = self.client.get(RECIPE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(res.data, list)
+
+    def test_paginate_with_cursor(self):
+        """test walking every page with next and previous cursors"""
+        recipes = [create_recipe(user=self.user) for i in range(5)]
+        expected_ids = [r.id for r in reversed(recipes)]
+
+        res = self.client.get(RECIPE_URL, {'page_size': 2})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsNone(res.data['previous'])
+        seen_ids = [r['id'] for r in res.data['results']]
+        pages = [res.data]
+        while res.data['next']:
+            res = self.client.get(res.data['next'])
+            seen_ids += [r['id'] for r in res.data['results']]
+            pages.append(res.data)
+
+        self.assertEqual(seen_ids, expected_ids)
+        self.assertEqual(len(pages), 3)
+
+        res = self.client.get(pages[-1]['previous'])
+        self.assertEqual(res.data['results'], pages[1]['results'])
+
+    def test_paginate_uses_keyset_seek(self):
+        """test later pages seek on id instead of using OFFSET"""
+        for i in range(3):
+            create_recipe(user=self.user)
+        res = self.client.get(RECIPE_URL, {'page_size': 1})
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(res.data['next'])
+
+        sql = [
+            q['sql'] for q in ctx.captured_queries if 'LIMIT' in q['sql']
+        ][0]
+        self.assertIn('"core_recipe"."id" <', sql)
+        self.assertNotIn('OFFSET', sql)
+
+    def test_paginate_with_filters(self):
+        """test pagination keeps the tag filter applied"""
+        tag = Tag.objects.create(user=self.user, name='Dinner')
+        tagged = []
+        for i in range(3):
+            recipe = create_recipe(user=self.user)
+            recipe.tags.add(tag)
+            tagged.append(recipe.id)
+            create_recipe(user=self.user)
+
+        params = {'tags': str(tag.id), 'page_size': 2}
+        res = self.client.get(RECIPE_URL, params)
+        ids = [r['id'] for r in res.data['results']]
+        res = self.client.get(res.data['next'])
+        ids += [r['id'] for r in res.data['results']]
+
+        self.assertEqual(ids, sorted(tagged, reverse=True))
+        self.assertIsNone(res.data['next'])
+
+    def test_pagination_in_schema(self):
+        """test the cursor parameters are documented"""
+        res = self.client.get(reverse('api-schema'), {'format': 'json'})
+        path = res.json()['paths']['/api/recipe/recipes/']
+        params = path['get']['parameters']
+        names = [p['name'] for p in params]
+
+        self.assertIn('cursor', names)
+        self.assertIn('page_size', names)
+
+    def test_unpaginated_list_in_schema(self):
+        """test the schema allows both the plain array and a page"""
+        res = self.client.get(reverse('api-schema'), {'format': 'json'})
+        schema = res.json()
+        ref = schema['paths']['/api/recipe/recipes/']['get']['responses'][
+            '200']['content']['application/json']['schema']['$ref']
+        shapes = schema['components']['schemas'][ref.split('/')[-1]]['oneOf']
+
+        self.assertEqual(shapes[0]['type'], 'array')
+        self.assertIn('results', shapes[1]['properties'])
+
+
+class RecipeRelatedUpdateTests(TestCase):
+    """test updating tags/ingredients only rewrites changed rows"""
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='user@example.com', password='password123'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(user=self.user)
+        self.names = ['Salt', 'Pepper', 'Garlic', 'Onion']
+        for name in self.names:
+            self.recipe.ingredients.add(
+                Ingredient.objects.create(user=self.user, name=name)
+            )
+        self.through = Recipe.ingredients.through
+
+    def _patch_ingredients(self, names):
+        """patch the recipe's ingredients and return the write statements"""
+        payload = {'ingredients': [{'name': name} for name in names]}
+        table = self.through._meta.db_table
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.patch(
+                detail_url(self.recipe.id), payload, format='json'
+            )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertCountEqual(
+            [i['name'] for i in res.data['ingredients']], names
+        )
+        statements = [
+            q['sql'].split()[0] for q in ctx.captured_queries
+            if table in q['sql']
+        ]
+        return statements.count('DELETE'), statements.count('INSERT')
+
+    def _through_ids(self):
+        return set(
+            self.through.objects.filter(
+                recipe=self.recipe
+            ).values_list('id', flat=True)
+        )
+
+    def test_update_without_changes(self):
+        """test resending the same ingredients writes nothing"""
+        before = self._through_ids()
+
+        self.assertEqual(self._patch_ingredients(self.names), (0, 0))
+        self.assertEqual(self._through_ids(), before)
+
+    def test_update_one_ingredient(self):
+        """test swapping one ingredient only touches its row"""
+        before = self._through_ids()
+        names = self.names[:-1] + ['Chili']
+
+        self.assertEqual(self._patch_ingredients(names), (1, 1))
+        after = self._through_ids()
+        self.assertEqual(len(before & after), 3)
+        self.assertEqual(len(after), 4)
+
+    def test_update_replace_all(self):
+        """test replacing every ingredient uses one delete and one insert"""
+        names = ['Lime', 'Basil', 'Rice']
+
+        self.assertEqual(self._patch_ingredients(names), (1, 1))
+        self.assertEqual(len(self._through_ids()), 3)
+
+    def test_update_sends_m2m_changed(self):
+        """test diffed updates still send m2m_changed signals"""
+        received = []
+
+        def receiver(action, pk_set, **kwargs):
+            received.append((action, pk_set))
+
+        m2m_changed.connect(receiver, sender=self.through)
+        self.addCleanup(m2m_changed.disconnect, receiver, sender=self.through)
+        self._patch_ingredients(self.names[1:] + ['Chili'])
+
+        chili = Ingredient.objects.get(user=self.user, name='Chili')
+        salt = Ingredient.objects.get(user=self.user, name='Salt')
+        self.assertIn(('post_remove', {salt.id}), received)
+        self.assertIn(('post_add', {chili.id}), received)
+
+
+class RecipeSearchTests(TestCase):
+    """test searching recipes by text"""
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='user@example.com', password='password123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_search_title_and_description(self):
+        """test search matches titles and descriptions"""
+        by_title = create_recipe(
+            user=self.user, title='Chicken curry', description='Spicy'
+        )
+        by_description = create_recipe(
+            user=self.user, title='Rice bowl', description='Chicken and rice'
+        )
+        create_recipe(user=self.user, title='Salad', description='Greens')
+        other = create_user(email='other@example.com', password='password123')
+        create_recipe(user=other, title='Chicken soup')
+
+        res = self.client.get(RECIPE_URL, {'search': 'chicken'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertCountEqual(
+            [r['id'] for r in res.data], [by_title.id, by_description.id]
+        )
+
+    def test_search_not_in_response(self):
+        """test the search vector is not exposed"""
+        recipe = create_recipe(user=self.user)
+        res = self.client.get(detail_url(recipe.id))
+        self.assertNotIn('search_vector', res.data)
+
+    @unittest.skipUnless(
+        connection.vendor == 'postgresql', 'full-text search needs PostgreSQL'
+    )
+    def test_search_ranks_title_matches_first(self):
+        """test title matches rank above description matches"""
+        by_description = create_recipe(
+            user=self.user, title='Rice bowl', description='with chicken'
+        )
+        by_title = create_recipe(
+            user=self.user, title='Chicken curry', description='Spicy'
+        )
+        older_title = create_recipe(
+            user=self.user, title='Roast chicken', description='Sunday'
+        )
+        by_title.title = 'Chickens roasted'
+        by_title.save()
+
+        res = self.client.get(RECIPE_URL, {'search': 'chickens'})
+
+        ids = [r['id'] for r in res.data]
+        self.assertEqual(ids[-1], by_description.id)
+        self.assertCountEqual(ids[:2], [by_title.id, older_title.id])
+
+
+class RecipeSparseFieldsTests(TestCase):
+    """test picking recipe fields with ?fields= and ?omit="""
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='user@example.com', password='password123'
+        )
+        self.client.force_authenticate(self.user)
+        self.recipe = create_recipe(user=self.user)
+        self.recipe.tags.add(Tag.objects.create(user=self.user, name='Vegan'))
+
+    def test_list_fields(self):
+        """test only the listed fields are fetched and returned"""
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(RECIPE_URL, {'fields': 'id,title'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data, [{'id': self.recipe.id, 'title': 'Sample recipe'}]
+        )
+        # freshness check and recipes, no tag or ingredient prefetch
+        self.assertEqual(len(ctx.captured_queries), 2)
+        self.assertNotIn('"price"', ctx.captured_queries[-1]['sql'])
+
+    def test_detail_omit(self):
+        """test omitted fields and their prefetches are skipped"""
+        url = detail_url(self.recipe.id)
+        with CaptureQueriesContext(connection) as ctx:
+            res = self.client.get(url, {'omit': 'ingredients,description'})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotIn('ingredients', res.data)
+        self.assertNotIn('description', res.data)
+        self.assertEqual(res.data['tags'][0]['name'], 'Vegan')
+        self.assertIn('image', res.data)
+        # freshness check, recipe and tags
+        self.assertEqual(len(ctx.captured_queries), 3)
+        self.assertNotIn('"description"', ctx.captured_queries[1]['sql'])
+
+    def test_list_omit_every_field(self):
+        """test omitting every field gives empty items, like the detail"""
+        omit = ','.join(RecipeSerializer.Meta.fields)
+        res = self.client.get(RECIPE_URL, {'omit': omit})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [{}])
+
+    def test_fields_and_omit_combined(self):
+        """test omit removes fields from the fields list"""
+        res = self.client.get(
+            detail_url(self.recipe.id),
+            {'fields': 'id,title,image_renditions', 'omit': 'title'},
+        )
+
+        self.assertEqual(
+            res.data, {'id': self.recipe.id, 'image_renditions': None}
+        )
+
+    def test_unknown_field_rejected(self):
+        """test unknown field names are a bad request"""
+        res = self.client.get(RECIPE_URL, {'fields': 'id,secret'})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('secret', str(res.data['fields']))
+
+    def test_writes_ignore_fields(self):
+        """test updates validate and return the whole recipe"""
+        res = self.client.patch(
+            f'{detail_url(self.recipe.id)}?fields=id', {'title': 'New'}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['title'], 'New')
+        self.assertIn('tags', res.data)
+
+    def test_fields_in_schema(self):
+        """test the list and detail views document the parameters"""
+        res = self.client.get(reverse('api-schema'), {'format': 'json'})
+        paths = res.json()['paths']
+
+        for path in ('/api/recipe/recipes/', '/api/recipe/recipes/{id}/'):
+            names = [p['name'] for p in paths[path]['get']['parameters']]
+            self.assertIn('fields', names)
+            self.assertIn('omit', names)
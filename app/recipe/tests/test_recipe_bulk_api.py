@@ -0,0 +1,181 @@
+""" test bulk recipe api's """
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Ingredient, Recipe, Tag
+
+BULK_URL = reverse('recipe:recipe-bulk')
+
+
+def create_recipe(user, **params):
+    defaults = {
+        'title': 'Sample recipe',
+        'time_minutes': 10,
+        'price': Decimal('5.99'),
+    }
+    defaults.update(params)
+    return Recipe.objects.create(user=user, **defaults)
+
+
+def recipe_payload(index, **params):
+    payload = {
+        'title': f'Recipe {index}',
+        'time_minutes': 10 + index,
+        'price': '5.99',
+        'tags': [{'name': 'Dinner'}, {'name': f'Tag {index}'}],
+        'ingredients': [{'name': 'Salt'}, {'name': f'Ingredient {index}'}],
+    }
+    payload.update(params)
+    return payload
+
+
+class PublicRecipeBulkAPITests(TestCase):
+    """test un-auth bulk requests"""
+    def test_auth_required(self):
+        res = APIClient().post(BULK_URL, [], format='json')
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateRecipeBulkAPITests(TestCase):
+    """test authenticated bulk requests"""
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            'user@example.com', 'password123'
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_bulk_create(self):
+        """test creating several recipes with tags and ingredients"""
+        Tag.objects.create(user=self.user, name='Dinner')
+        payload = [recipe_payload(i) for i in range(3)]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([r['title'] for r in res.data],
+                         [p['title'] for p in payload])
+        recipes = Recipe.objects.filter(user=self.user)
+        self.assertEqual(recipes.count(), 3)
+        self.assertEqual(Tag.objects.filter(name='Dinner').count(), 1)
+        self.assertEqual(Ingredient.objects.filter(name='Salt').count(), 1)
+        for recipe, item in zip(recipes.order_by('id'), res.data):
+            self.assertEqual(recipe.id, item['id'])
+            self.assertEqual(recipe.tags.count(), 2)
+            self.assertEqual(recipe.ingredients.count(), 2)
+
+    def test_bulk_create_query_count_is_constant(self):
+        """test bulk create statements do not grow with related items"""
+        counts = []
+        for size in (2, 20):
+            payload = [recipe_payload(i) for i in range(size)]
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.post(BULK_URL, payload, format='json')
+            counts.append(len(ctx.captured_queries) - size)
+        self.assertEqual(counts[0], counts[1])
+
+    def test_bulk_create_validates_everything_first(self):
+        """test one invalid recipe rejects the whole batch"""
+        payload = [recipe_payload(0), recipe_payload(1, time_minutes='x')]
+
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('time_minutes', res.data[1])
+        self.assertFalse(Recipe.objects.exists())
+        self.assertFalse(Tag.objects.exists())
+
+    def test_bulk_create_requires_list(self):
+        """test a non-list payload is rejected"""
+        res = self.client.post(BULK_URL, recipe_payload(0), format='json')
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_create_limits_size(self):
+        """test payloads over the item limit are rejected"""
+        payload = [recipe_payload(i) for i in range(501)]
+        res = self.client.post(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Recipe.objects.exists())
+
+    def test_bulk_partial_update(self):
+        """test updating fields and tags of several recipes"""
+        r1 = create_recipe(self.user, title='Old 1')
+        r2 = create_recipe(self.user, title='Old 2')
+        lunch = Tag.objects.create(user=self.user, name='Lunch')
+        r2.tags.add(lunch)
+        payload = [
+            {'id': r1.id, 'title': 'New 1'},
+            {'id': r2.id, 'tags': [{'name': 'Dinner'}]},
+        ]
+
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([r['id'] for r in res.data], [r1.id, r2.id])
+        r1.refresh_from_db()
+        r2.refresh_from_db()
+        self.assertEqual(r1.title, 'New 1')
+        self.assertEqual(r2.title, 'Old 2')
+        self.assertEqual(
+            list(r2.tags.values_list('name', flat=True)), ['Dinner']
+        )
+        self.assertEqual(res.data[1]['tags'][0]['name'], 'Dinner')
+
+    def test_bulk_partial_update_other_users_recipe(self):
+        """test updating another user's recipe fails the whole batch"""
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'password123'
+        )
+        mine = create_recipe(self.user, title='Mine')
+        theirs = create_recipe(other, title='Theirs')
+        payload = [
+            {'id': mine.id, 'title': 'Changed'},
+            {'id': theirs.id, 'title': 'Changed'},
+        ]
+
+        res = self.client.patch(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn('id', res.data[1])
+        mine.refresh_from_db()
+        theirs.refresh_from_db()
+        self.assertEqual(mine.title, 'Mine')
+        self.assertEqual(theirs.title, 'Theirs')
+
+    def test_bulk_partial_update_requires_id(self):
+        """test each update item needs an id"""
+        res = self.client.patch(BULK_URL, [{'title': 'x'}], format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('id', res.data[0])
+
+    def test_bulk_delete(self):
+        """test deleting recipes reports per item results"""
+        r1 = create_recipe(self.user)
+        r2 = create_recipe(self.user)
+        other = get_user_model().objects.create_user(
+            'other@example.com', 'password123'
+        )
+        theirs = create_recipe(other)
+        payload = {'ids': [r1.id, theirs.id, r2.id]}
+
+        res = self.client.delete(BULK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, [
+            {'id': r1.id, 'deleted': True},
+            {'id': theirs.id, 'deleted': False},
+            {'id': r2.id, 'deleted': True},
+        ])
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+        self.assertTrue(Recipe.objects.filter(id=theirs.id).exists())
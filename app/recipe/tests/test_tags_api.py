@@ -100,4 +100,64 @@ class PrivateTagsApiTests(TestCase):
         recipe1.tags.add(tag)
         recipe2.tags.add(tag)
         res = self.client.get(TAGS_URL,{'assigned_only':1})
-        self.assertEqual(len(res.data),1)
\ No newline at end of file
+        self.assertEqual(len(res.data),1)
+
+    def test_tags_with_recipe_count(self):
+        """test recipe counts come from a single query """
+        tag1 = Tag.objects.create(user=self.user, name='tag1')
+        Tag.objects.create(user=self.user, name='tag2')
+        for i in range(2):
+            recipe = Recipe.objects.create(
+                title=f'recipe{i}', time_minutes=1, user=self.user,
+                price=Decimal('10.2'),
+            )
+            recipe.tags.add(tag1)
+
+        with self.assertNumQueries(1):
+            res = self.client.get(TAGS_URL, {'recipe_count': 1})
+        counts = {tag['name']: tag['recipe_count'] for tag in res.data}
+        self.assertEqual(counts, {'tag1': 2, 'tag2': 0})
+
+        res = self.client.get(
+            TAGS_URL, {'recipe_count': 1, 'assigned_only': 1}
+        )
+        self.assertEqual(
+            res.data, [{'id': tag1.id, 'name': 'tag1', 'recipe_count': 2}]
+        )
+        self.assertNotIn('recipe_count', self.client.get(TAGS_URL).data[0])
+
+    def test_invalid_flag_rejected(self):
+        """test flags other than 0 or 1 are a bad request """
+        Tag.objects.create(user=self.user, name='tag1')
+        for params in ({'recipe_count': 'yes'}, {'assigned_only': '2'}):
+            res = self.client.get(TAGS_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(next(iter(params)), res.data)
+
+    def test_recipe_count_in_schema(self):
+        """test the list documents the counted items once per view set """
+        res = self.client.get(reverse('api-schema'), {'format': 'json'})
+        paths = res.json()['paths']
+
+        for path, component in (
+            ('/api/recipe/tags/', 'TagCount'),
+            ('/api/recipe/ingredients/', 'IngredientCount'),
+        ):
+            operation = paths[path]['get']
+            schema = operation['responses']['200']['content'][
+                'application/json']['schema']
+            self.assertEqual(
+                schema['items']['$ref'], f'#/components/schemas/{component}'
+            )
+            names = [p['name'] for p in operation['parameters']]
+            self.assertEqual(names.count('assigned_only'), 1)
+
+    def test_update_tag_duplicate_name(self):
+        """test renaming a tag to a name the user already has fails """
+        Tag.objects.create(user=self.user, name='tag1')
+        tag = Tag.objects.create(user=self.user, name='tag2')
+        res = self.client.patch(detail_url(tag.id), {'name': 'tag1'})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        tag.refresh_from_db()
+        self.assertEqual(tag.name, 'tag2')
@@ -1,55 +1,219 @@
 """ views for recipe api's """
 
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Exists, F, OuterRef, Q
+from django.http import StreamingHttpResponse
+from django.utils.functional import cached_property
+from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
 from rest_framework import viewsets,mixins,status
+from rest_framework.exceptions import ValidationError
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from core.authentication import CachedTokenAuthentication
 from core.models import Ingredient, Recipe,Tag
 from recipe import serializers
+from recipe.bulk import create_recipes, update_recipes
+from recipe.cache import CachedListMixin, ConditionalGetMixin
+from recipe.export import FORMATS, iter_rows
+from recipe.images import schedule_renditions
+from recipe.listing import ValuesListMixin
+from recipe.pagination import RecipeCursorPagination
 from drf_spectacular.utils import (
     extend_schema,
     extend_schema_view,
     OpenApiTypes,
     OpenApiParameter,
+    OpenApiResponse,
 )
 
 
+RECIPE_FILTER_PARAMETERS = [
+    OpenApiParameter(
+        "tags",
+        OpenApiTypes.STR,
+        description="Comma separated list of tag ids to filter",
+    ),
+    OpenApiParameter(
+        "ingredients",
+        OpenApiTypes.STR,
+        description="Comma separated list of ingredient ids to filter",
+    ),
+    OpenApiParameter(
+        "match",
+        OpenApiTypes.STR,
+        enum=['any', 'all'],
+        description=(
+            "Return recipes matching any (default) or all of the "
+            "listed tags/ingredients"
+        ),
+    ),
+    OpenApiParameter(
+        "search",
+        OpenApiTypes.STR,
+        description=(
+            "Full-text search over title and description, ranked "
+            "by relevance (newest first when paginated)"
+        ),
+    ),
+]
+
+SPARSE_FIELD_PARAMETERS = [
+    OpenApiParameter(
+        "fields",
+        OpenApiTypes.STR,
+        description=(
+            "Comma separated list of fields to return; the rest are "
+            "neither fetched nor serialized"
+        ),
+    ),
+    OpenApiParameter(
+        "omit",
+        OpenApiTypes.STR,
+        description="Comma separated list of fields to leave out",
+    ),
+]
+
+# related fields served by a prefetch rather than a recipe column
+PREFETCHED_FIELDS = ('tags', 'ingredients')
+# serializer fields reading columns other than their own
+FIELD_COLUMNS = {'image_renditions': ('image', 'image_renditions')}
+
+
 @extend_schema_view(
     list=extend_schema(
-        parameters=[
-            OpenApiParameter(
-                "tags",
-                OpenApiTypes.STR,
-                description="Comma separated list of tag ids to filter",
-            ),
-            OpenApiParameter(
-                "ingredients",
-                OpenApiTypes.STR,
-                description="Comma separated list of ingredient ids to filter",
-            ),
-        ]
-    )
+        parameters=RECIPE_FILTER_PARAMETERS + SPARSE_FIELD_PARAMETERS
+    ),
+    retrieve=extend_schema(parameters=SPARSE_FIELD_PARAMETERS),
 )
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(
+    CachedListMixin,
+    ConditionalGetMixin,
+    ValuesListMixin,
+    viewsets.ModelViewSet,
+):
     """Manage recipes API's"""
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
     serializer_class = serializers.RecipeDetailSerializer
+    pagination_class = RecipeCursorPagination
     queryset = Recipe.objects.all()
+    bulk_max_items = 500
+    export_chunk_size = 500
 
     def get_queryset(self):
         """Retrieve the recipes for the authenticated user"""
         tags = self.request.query_params.get('tags')
         ingredients = self.request.query_params.get('ingredients')
-        queryset = self.queryset
+        match_all = self.request.query_params.get('match') == 'all'
+        queryset = self.queryset.filter(user=self.request.user)
         if tags :
             tag_ids= self._params_to_int(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            queryset = self._filter_related(
+                queryset, Recipe.tags.through, 'tag_id', tag_ids, match_all
+            )
         if ingredients:
             ingredient_ids = self._params_to_int(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
-        return queryset.filter(user=self.request.user).order_by('-id').distinct()
+            queryset = self._filter_related(
+                queryset,
+                Recipe.ingredients.through,
+                'ingredient_id',
+                ingredient_ids,
+                match_all,
+            )
+        ordering = ['-id']
+        search = self.request.query_params.get('search')
+        if search:
+            queryset, ordering = self._search(queryset, search)
+        return self._select_fields(queryset.order_by(*ordering))
+
+    @cached_property
+    def sparse_fields(self):
+        """The fields picked with `?fields=` / `?omit=`, or None for all.
+
+        Only reads of the list and detail views are trimmed, so writes
+        always validate and return the whole recipe.
+        """
+        params = self.request.query_params
+        if (
+            self.action not in ('list', 'retrieve')
+            or self.request.method not in SAFE_METHODS
+            or not (params.get('fields') or params.get('omit'))
+        ):
+            return None
+
+        available = self.get_serializer_class().Meta.fields
+        errors = {}
+        for param in ('fields', 'omit'):
+            unknown = set(self._params_to_names(param)) - set(available)
+            if unknown:
+                errors[param] = [
+                    f'Unknown field(s): {", ".join(sorted(unknown))}.'
+                ]
+        if errors:
+            raise ValidationError(errors)
+
+        fields = self._params_to_names('fields') or available
+        omit = self._params_to_names('omit')
+        return [
+            name for name in available
+            if name in fields and name not in omit
+        ]
+
+    def _select_fields(self, queryset):
+        """Prefetch and load only what the requested fields need"""
+        fields = self.sparse_fields
+        if fields is None:
+            return queryset.prefetch_related(*PREFETCHED_FIELDS)
+
+        columns = {'id'}
+        for name in fields:
+            if name not in PREFETCHED_FIELDS:
+                columns.update(FIELD_COLUMNS.get(name, (name,)))
+        return queryset.only(*columns).prefetch_related(*(
+            name for name in PREFETCHED_FIELDS if name in fields
+        ))
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        if self.sparse_fields is not None:
+            context['fields'] = self.sparse_fields
+        return context
+
+    def _search(self, queryset, search):
+        """Filter recipes by text, returning the queryset and ordering.
+
+        PostgreSQL matches against the trigger-maintained, GIN indexed
+        search vector and ranks title hits above description hits. Other
+        databases fall back to a case-insensitive substring match.
+        """
+        if connection.vendor != 'postgresql':
+            return queryset.filter(
+                Q(title__icontains=search) | Q(description__icontains=search)
+            ), ['-id']
+        query = SearchQuery(search, config='english', search_type='websearch')
+        return queryset.filter(search_vector=query).annotate(
+            rank=SearchRank(F('search_vector'), query)
+        ), ['-rank', '-id']
+
+    def _filter_related(self, queryset, through, column, ids, match_all):
+        """Filter recipes linked to any (or all) of the given ids.
+
+        Filtering through subqueries on the through table rather than a
+        join means each recipe appears once without needing DISTINCT.
+        """
+        if not match_all:
+            return queryset.filter(Exists(
+                through.objects.filter(
+                    recipe_id=OuterRef('pk'), **{f'{column}__in': ids}
+                )
+            ))
+        matching = through.objects.filter(
+            **{f'{column}__in': ids}
+        ).values('recipe_id').annotate(
+            matched=Count('id')
+        ).filter(matched=len(set(ids))).values('recipe_id')
+        return queryset.filter(id__in=matching)
 
     def get_serializer_class(self):
         """Return appropriate serializer based on action"""
@@ -57,6 +221,13 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return serializers.RecipeSerializer
         elif self.action == 'upload_image':
             return serializers.RecipeImageSerializer
+        elif self.action == 'export':
+            return serializers.RecipeExportSerializer
+        elif self.action == 'bulk':
+            return {
+                'PATCH': serializers.RecipeBulkUpdateSerializer,
+                'DELETE': serializers.RecipeBulkDeleteSerializer,
+            }.get(self.request.method, serializers.RecipeSerializer)
 
         return self.serializer_class
 
@@ -66,63 +237,341 @@ class RecipeViewSet(viewsets.ModelViewSet):
 
     @action(methods=['POST'], detail=True, url_path='upload-image')
     def upload_image(self, request, pk=None):
-        """Upload an image to recipe."""
+        """Upload an image to recipe.
+
+        Renditions of the new image are built in the background and show
+        up on the detail view once they are ready. The replaced image is
+        left for gc_media, which deletes it once no recipe shares it.
+        """
         recipe = self.get_object()
         serializer = self.get_serializer(recipe, data=request.data)
 
         if serializer.is_valid():
-            serializer.save()
+            serializer.save(image_renditions={})
+            schedule_renditions(recipe)
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @extend_schema(
+        methods=['POST'],
+        request=serializers.RecipeSerializer(many=True),
+        responses=serializers.RecipeSerializer(many=True),
+    )
+    @extend_schema(
+        methods=['PATCH'],
+        request=serializers.RecipeBulkUpdateSerializer(many=True),
+        responses=serializers.RecipeSerializer(many=True),
+    )
+    @extend_schema(
+        methods=['DELETE'],
+        request=serializers.RecipeBulkDeleteSerializer,
+        responses=OpenApiTypes.OBJECT,
+    )
+    @action(
+        methods=['POST', 'PATCH', 'DELETE'],
+        detail=False,
+        url_path='bulk',
+        pagination_class=None,
+    )
+    def bulk(self, request):
+        """Create, partially update or delete a list of recipes."""
+        handler = {
+            'POST': self._bulk_create,
+            'PATCH': self._bulk_update,
+            'DELETE': self._bulk_delete,
+        }[request.method]
+        return handler(request)
+
+    @extend_schema(
+        parameters=RECIPE_FILTER_PARAMETERS + [
+            OpenApiParameter(
+                "export_format",
+                OpenApiTypes.STR,
+                enum=list(FORMATS),
+                description="Newline delimited JSON (default) or CSV",
+            ),
+        ],
+        responses=OpenApiTypes.STR,
+    )
+    @action(methods=['GET'], detail=False, pagination_class=None)
+    def export(self, request):
+        """Stream every matching recipe as NDJSON or CSV.
+
+        Recipes are read from a database cursor and serialized a chunk at
+        a time while the response is sent, so memory use doesn't grow
+        with the number of recipes.
+        """
+        export_format = request.query_params.get('export_format', 'ndjson')
+        if export_format not in FORMATS:
+            raise ValidationError(
+                {'export_format': [f'Must be one of: {", ".join(FORMATS)}.']}
+            )
+        write_lines, content_type = FORMATS[export_format]
+        rows = iter_rows(
+            self.filter_queryset(self.get_queryset()),
+            self.get_serializer_class(),
+            self.export_chunk_size,
+        )
+        response = StreamingHttpResponse(
+            write_lines(rows), content_type=content_type
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="recipes.{export_format}"'
+        )
+        # stream through nginx rather than buffering the whole export
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    def _bulk_create(self, request):
+        """Validate every recipe, then create them all in one transaction"""
+        error = self._check_bulk_size(request.data)
+        if error:
+            return error
+        serializer = self.get_serializer(data=request.data, many=True)
+        serializer.is_valid(raise_exception=True)
+        with transaction.atomic():
+            recipes = create_recipes(request.user, serializer.validated_data)
+
+        return Response(
+            self._bulk_results(recipes), status=status.HTTP_201_CREATED
+        )
+
+    def _bulk_update(self, request):
+        """Validate every update, then apply them all in one transaction"""
+        error = self._check_bulk_size(request.data)
+        if error:
+            return error
+        serializer = self.get_serializer(
+            data=request.data, many=True, partial=True
+        )
+        serializer.is_valid(raise_exception=True)
+
+        ids = [item['id'] for item in serializer.validated_data]
+        recipes = self.queryset.filter(
+            user=self.request.user
+        ).in_bulk(ids)
+        errors, seen = [], set()
+        for recipe_id in ids:
+            if recipe_id not in recipes:
+                errors.append({'id': ['Recipe not found.']})
+            elif recipe_id in seen:
+                errors.append({'id': ['Duplicate recipe id.']})
+            else:
+                errors.append({})
+            seen.add(recipe_id)
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        pairs = [
+            (
+                recipes[item['id']],
+                {k: v for k, v in item.items() if k != 'id'},
+            )
+            for item in serializer.validated_data
+        ]
+        with transaction.atomic():
+            updated = update_recipes(request.user, pairs)
+
+        return Response(self._bulk_results(updated), status=status.HTTP_200_OK)
+
+    def _bulk_delete(self, request):
+        """Delete the listed recipes, reporting which ones existed"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data['ids']))
+        error = self._check_bulk_size(ids)
+        if error:
+            return error
+
+        recipes = self.queryset.filter(user=self.request.user, id__in=ids)
+        with transaction.atomic():
+            existing = set(recipes.values_list('id', flat=True))
+            recipes.delete()
+
+        return Response(
+            [
+                {'id': recipe_id, 'deleted': recipe_id in existing}
+                for recipe_id in ids
+            ],
+            status=status.HTTP_200_OK,
+        )
+
+    def _check_bulk_size(self, items):
+        """Return an error response for payloads that are not a short list"""
+        if not isinstance(items, list):
+            msg = 'Expected a list of items.'
+        elif len(items) > self.bulk_max_items:
+            msg = f'Ensure there are no more than {self.bulk_max_items} items.'
+        else:
+            return None
+        return Response(
+            {'non_field_errors': [msg]},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    def _bulk_results(self, recipes):
+        """Serialize recipes in order with tags/ingredients prefetched"""
+        fresh = self.queryset.filter(
+            id__in=[recipe.id for recipe in recipes]
+        ).prefetch_related('tags', 'ingredients').in_bulk()
+        return serializers.RecipeSerializer(
+            [fresh[recipe.id] for recipe in recipes], many=True
+        ).data
+
     def _params_to_int(self,qs):
         """Convert a list of string IDs to a list of integers"""
         return [int(str_id) for str_id in qs.split(',')]
 
+    def _params_to_names(self, param):
+        """Split a comma separated query parameter into names"""
+        value = self.request.query_params.get(param, '')
+        return [name.strip() for name in value.split(',') if name.strip()]
+
 @extend_schema_view(
     list=extend_schema(
         parameters=[
             OpenApiParameter(
-                'assigned_only',
-                OpenApiTypes.INT, enum=[0,1],
-                description='Filter by items assigned to recipes. ',
+                "assigned_only",
+                OpenApiTypes.INT,
+                enum=[0, 1],
+                description="Only return items assigned to recipes",
+            ),
+            OpenApiParameter(
+                "recipe_count",
+                OpenApiTypes.INT,
+                enum=[0, 1],
+                description="Add the number of recipes using each item",
             ),
         ]
     )
 )
 class BaseRecipeAttrViewSet(
+    CachedListMixin,
     mixins.UpdateModelMixin,
     mixins.ListModelMixin,
     mixins.DestroyModelMixin,
     viewsets.GenericViewSet
 ):
     """ base view set for recipe attributes """
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]  # only authenticated users can access this view
+    # the Recipe many-to-many field holding these items
+    recipe_field = None
+    count_serializer_class = None
+    autocomplete_limit = 10
+    autocomplete_max_limit = 50
+
+    def _flag(self, name):
+        """Read a 0/1 query parameter, rejecting other values with a 400"""
+        value = self.request.query_params.get(name, '0')
+        if value not in ('0', '1'):
+            raise ValidationError({name: ['Must be 0 or 1.']})
+        return value == '1'
 
     def get_queryset(self):
         """Retrieve the ingredients for the authenticated user"""
-        assigned_only = bool(
-            int(self.request.query_params.get('assigned_only',0))
-        )
-        queryset = self.queryset
-        if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
+        queryset = self.queryset.filter(user=self.request.user)
+        if self._flag('assigned_only'):
+            # EXISTS stops at the first link and needs no DISTINCT
+            field = Recipe._meta.get_field(self.recipe_field)
+            queryset = queryset.filter(Exists(
+                field.remote_field.through.objects.filter(
+                    **{field.m2m_reverse_field_name(): OuterRef('pk')}
+                )
+            ))
+        if self._flag('recipe_count'):
+            # one GROUP BY over the link table, joined on the index
+            queryset = queryset.annotate(recipe_count=Count('recipe'))
 
-        return queryset.filter(
-            user=self.request.user
-        ).order_by('-name').distinct()
+        return queryset.order_by('-name')
 
+    def get_serializer_class(self):
+        if self.action == 'autocomplete' or (
+            self.action == 'list' and self._flag('recipe_count')
+        ):
+            return self.count_serializer_class
+        return self.serializer_class
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "q",
+                OpenApiTypes.STR,
+                description="Case-insensitive name prefix",
+            ),
+            OpenApiParameter(
+                "limit",
+                OpenApiTypes.INT,
+                description="Maximum suggestions (default 10, at most 50)",
+            ),
+        ],
+    )
+    @action(methods=['GET'], detail=False, pagination_class=None)
+    def autocomplete(self, request):
+        """Suggest the user's items whose name starts with `q`.
+
+        The most used items come first. The prefix match is served by the
+        (user, UPPER(name)) index on PostgreSQL (core migration 0014).
+        """
+        try:
+            limit = int(request.query_params.get(
+                'limit', self.autocomplete_limit
+            ))
+        except ValueError:
+            raise ValidationError({'limit': ['A valid integer is required.']})
+        limit = max(1, min(limit, self.autocomplete_max_limit))
+
+        queryset = self.queryset.filter(
+            user=request.user,
+            name__istartswith=request.query_params.get('q', ''),
+        ).annotate(
+            recipe_count=Count('recipe'),
+        ).order_by('-recipe_count', 'name')[:limit]
+        return Response(self.get_serializer(queryset, many=True).data)
+
+    def perform_update(self, serializer):
+        """Update the item, rejecting names the user already has"""
+        try:
+            with transaction.atomic():
+                serializer.save()
+        except IntegrityError:
+            raise ValidationError({'name': ['This name is already in use.']})
+
+
+def attr_schema(count_serializer_class):
+    """Document the lists of a recipe attribute view set.
+
+    Both return the view set's own counted items; the base class can't
+    name them, so each view set is decorated with its serializer.
+    """
+    return extend_schema_view(
+        list=extend_schema(responses={200: OpenApiResponse(
+            response=count_serializer_class(many=True),
+            description=(
+                "Items only carry recipe_count when requested with "
+                "recipe_count=1"
+            ),
+        )}),
+        autocomplete=extend_schema(
+            responses=count_serializer_class(many=True),
+        ),
+    )
+
+
+@attr_schema(serializers.TagCountSerializer)
 class TagViewSet(BaseRecipeAttrViewSet):
     """Manage tags API's"""
     serializer_class = serializers.TagSerializer
+    count_serializer_class = serializers.TagCountSerializer
+    recipe_field = 'tags'
     queryset = Tag.objects.all()  # get all tags from the database
 
 
+@attr_schema(serializers.IngredientCountSerializer)
 class IngredientsViewSet(BaseRecipeAttrViewSet):
 
     """Manage ingredients API's"""
     serializer_class = serializers.IngredientSerializer
+    count_serializer_class = serializers.IngredientCountSerializer
+    recipe_field = 'ingredients'
     queryset = Ingredient.objects.all()  # get all ingredients from the database
-
-
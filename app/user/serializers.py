@@ -7,7 +7,10 @@ from django.contrib.auth import (
 
 from rest_framework import serializers
 
-class UserSerializer(serializers.ModelSerializer):
+from core.instrumentation import TimedSerializerMixin
+
+
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for user object"""
 
     class Meta:
@@ -50,4 +53,9 @@ class authTokenSerializer(serializers.Serializer):
             msg = 'Unable to authenticate with provided credentials'
             raise serializers.ValidationError(msg, code='authorization')
         attrs['user'] = user
-        return attrs
\ No newline at end of file
+        return attrs
+
+
+class RefreshTokenSerializer(serializers.Serializer):
+    """Serializer for exchanging a refresh token"""
+    refresh = serializers.CharField(trim_whitespace=False)
@@ -1,11 +1,19 @@
-from django.test import TestCase
+from datetime import timedelta
+from unittest.mock import patch
+
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core.models import RefreshToken
+
 CREATE_USER_URL = reverse('user:create')
 TOKEN_URL = reverse('user:token')
+REFRESH_URL = reverse('user:token-refresh')
 ME_URL = reverse('user:me')
 
 def create_user(**params):
@@ -133,4 +141,164 @@ class PrivateUserApiTests(TestCase):
         self.user.refresh_from_db()
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
-        self.assertEqual(res.status_code, status.HTTP_200_OK)
\ No newline at end of file
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+class TokenRefreshTests(TestCase):
+    """Test expiring access tokens and the refresh endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(
+            email='test@example.com',
+            password='test12345'
+        )
+
+    def login(self):
+        res = self.client.post(TOKEN_URL, {
+            'email': 'test@example.com',
+            'password': 'test12345',
+        })
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return res.data
+
+    def test_login_returns_refresh_token(self):
+        """Test login returns an access token, refresh token and lifetime"""
+        data = self.login()
+
+        self.assertIn('refresh', data)
+        self.assertGreater(data['expires_in'], 0)
+        self.assertEqual(self.login()['token'], data['token'])
+
+    def test_refresh_skips_password_check(self):
+        """Test refreshing issues tokens without authenticate()"""
+        data = self.login()
+
+        with patch('user.serializers.authenticate') as patched:
+            res = self.client.post(REFRESH_URL, {'refresh': data['refresh']})
+
+        patched.assert_not_called()
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res.data['refresh'], data['refresh'])
+
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f'Token {res.data["token"]}'
+        )
+        self.assertEqual(
+            self.client.get(ME_URL).status_code, status.HTTP_200_OK
+        )
+
+    def test_refresh_keeps_other_devices_signed_in(self):
+        """Test one device refreshing doesn't break another's token"""
+        devices = [APIClient(), APIClient()]
+        sessions = []
+        for device in devices:
+            data = self.login()
+            device.credentials(HTTP_AUTHORIZATION=f'Token {data["token"]}')
+            sessions.append(data)
+
+        for refreshing, other in ((0, 1), (1, 0)):
+            res = self.client.post(
+                REFRESH_URL, {'refresh': sessions[refreshing]['refresh']}
+            )
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            sessions[refreshing] = res.data
+            devices[refreshing].credentials(
+                HTTP_AUTHORIZATION=f'Token {res.data["token"]}'
+            )
+
+            for device in devices:
+                self.assertEqual(
+                    device.get(ME_URL).status_code, status.HTTP_200_OK
+                )
+
+    @override_settings(ACCESS_TOKEN_LIFETIME=60)
+    def test_refresh_replaces_expired_access_token(self):
+        """Test refreshing issues a new access token once it has expired"""
+        data = self.login()
+        Token.objects.update(created=timezone.now() - timedelta(seconds=61))
+
+        res = self.client.post(REFRESH_URL, {'refresh': data['refresh']})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res.data['token'], data['token'])
+        self.assertGreater(res.data['expires_in'], 0)
+
+    def test_refresh_token_single_use(self):
+        """Test a refresh token can't be used twice"""
+        refresh = self.login()['refresh']
+        self.client.post(REFRESH_URL, {'refresh': refresh})
+
+        res = self.client.post(REFRESH_URL, {'refresh': refresh})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertNotIn('token', res.data)
+
+    def test_refresh_rejects_expired_and_inactive(self):
+        """Test expired refresh tokens and inactive users are rejected"""
+        refresh = self.login()['refresh']
+        RefreshToken.objects.update(expires=timezone.now())
+        res = self.client.post(REFRESH_URL, {'refresh': refresh})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+        refresh = self.login()['refresh']
+        self.user.is_active = False
+        self.user.save()
+        res = self.client.post(REFRESH_URL, {'refresh': refresh})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_password_change_revokes_tokens(self):
+        """Test changing the password deletes access and refresh tokens"""
+        data = self.login()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {data["token"]}')
+        self.client.patch(ME_URL, {'password': 'newpass123'})
+
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+        self.assertFalse(RefreshToken.objects.filter(user=self.user).exists())
+        self.assertEqual(
+            self.client.get(ME_URL).status_code, status.HTTP_401_UNAUTHORIZED
+        )
+        res = self.client.post(REFRESH_URL, {'refresh': data['refresh']})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_deactivation_revokes_tokens(self):
+        """Test deactivating the user deletes access and refresh tokens"""
+        self.login()
+        self.user.is_active = False
+        self.user.save()
+
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+        self.assertFalse(RefreshToken.objects.filter(user=self.user).exists())
+
+    def test_other_changes_keep_tokens(self):
+        """Test saving other details leaves the tokens alone"""
+        self.login()
+        self.user.refresh_from_db()
+        self.user.name = 'New name'
+        self.user.save()
+
+        self.assertTrue(Token.objects.filter(user=self.user).exists())
+        self.assertTrue(RefreshToken.objects.filter(user=self.user).exists())
+
+    @override_settings(ACCESS_TOKEN_LIFETIME=60)
+    def test_expired_access_token_rejected(self):
+        """Test access tokens stop working after their lifetime"""
+        token = self.login()['token']
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {token}')
+        self.assertEqual(
+            self.client.get(ME_URL).status_code, status.HTTP_200_OK
+        )
+
+        later = timezone.now() + timedelta(seconds=61)
+        with patch('core.authentication.timezone.now', return_value=later):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(ACCESS_TOKEN_LIFETIME=60)
+    def test_login_replaces_expired_access_token(self):
+        """Test logging in again replaces an expired access token"""
+        token = self.login()['token']
+        Token.objects.update(created=timezone.now() - timedelta(seconds=61))
+
+        self.assertNotEqual(self.login()['token'], token)
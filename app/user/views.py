@@ -1,12 +1,19 @@
 from django.shortcuts import render
-from rest_framework import generics, authentication, permissions
+from rest_framework import generics, permissions, serializers
+from rest_framework.response import Response
 from user.serializers import (
     UserSerializer,
+    RefreshTokenSerializer,
     authTokenSerializer
     )
 
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.settings import api_settings
+from core.authentication import (
+    CachedTokenAuthentication,
+    issue_tokens,
+    refresh_tokens,
+)
 
 # Create your views here.
 
@@ -19,10 +26,33 @@ class CreateTokenView(ObtainAuthToken):
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
     serializer_class = authTokenSerializer
 
+    def post(self, request, *args, **kwargs):
+        """check the password and return access and refresh tokens"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(issue_tokens(serializer.validated_data['user']))
+
+
+class RefreshTokenView(generics.GenericAPIView):
+    """exchange a refresh token for new tokens without the password"""
+    serializer_class = RefreshTokenSerializer
+    authentication_classes = ()
+    permission_classes = ()
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = refresh_tokens(serializer.validated_data['refresh'])
+        if data is None:
+            raise serializers.ValidationError(
+                'Invalid or expired refresh token', code='authorization'
+            )
+        return Response(data)
+
 class ManageUserView(generics.RetrieveUpdateAPIView):
     """manage the authenticated user"""
     serializer_class = UserSerializer
-    authentication_classes = (authentication.TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (permissions.IsAuthenticated,)
 
     def get_object(self):
@@ -5,9 +5,29 @@ server {
         alias /vol/static;
     }
 
+    # only served on the metrics listener below
+    location = /metrics {
+        return 404;
+    }
+
     location / {
         uwsgi_pass      ${APP_HOST}:${APP_PORT};
         include        /etc/nginx/uwsgi_params;
         client_max_body_size 10M;
     }
+}
+
+# metrics for the scraper; the port is not published (see
+# docker-compose-deploy.yml) and the app also wants METRICS_TOKEN
+server {
+    listen ${METRICS_PORT};
+
+    location = /metrics {
+        uwsgi_pass      ${APP_HOST}:${APP_PORT};
+        include        /etc/nginx/uwsgi_params;
+    }
+
+    location / {
+        return 404;
+    }
 }
\ No newline at end of file
@@ -6,4 +6,10 @@ python manage.py wait_for_db
 python manage.py collectstatic --noinput
 python manage.py migrate
 
+# the uwsgi workers share their metrics through files in this directory;
+# start from an empty one so counters of old workers are not reported
+export PROMETHEUS_MULTIPROC_DIR=${PROMETHEUS_MULTIPROC_DIR:-/vol/metrics}
+rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
 uwsgi --socket :9000 --workers 4 --master --enable-threads --module app.wsgi
\ No newline at end of file